@@ -0,0 +1,166 @@
+"""
+Async HTTP API for the RAG engine, independent of Streamlit.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Endpoints:
+    POST /videos                     start ingesting {"url"} or {"video_id"}
+    GET  /videos/{video_id}          ingestion / index status, incl. coverage of a
+                                     long video still being indexed
+    POST /videos/{video_id}/query    {"question", "history"} → {"answer"}
+    POST /videos/{video_id}/stream   same input, answer streamed as plain text
+    GET  /healthz                    liveness + resident engine count
+    GET  /metrics                    Prometheus metrics (see metrics.py)
+
+Each worker process has its own engine registry. A query for a video this
+worker has not loaded ingests it on demand; with RECALL_INDEX_CACHE_DIR
+and RECALL_TRANSCRIPT_CACHE_DIR on shared storage that is a cache read,
+so any worker behind the load balancer can serve any video.
+"""
+import time
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from chatbot_engine import indexing_coverage
+from engine_registry import get_registry
+from ingestion_queue import DONE, FAILED, get_ingestion_queue
+from metrics import metrics
+from youtube_utils import extract_video_id
+
+load_dotenv()
+
+app = FastAPI(title="Recall API")
+
+
+class IngestRequest(BaseModel):
+    url: str | None = None
+    video_id: str | None = None
+
+
+class Message(BaseModel):
+    role: str
+    content: str
+
+
+class QueryRequest(BaseModel):
+    question: str
+    history: list[Message] = []
+
+
+# ── Endpoints ───────────────────────────────────────────────────────────────
+
+@app.post("/videos", status_code=202)
+async def ingest(request: IngestRequest):
+    video_id = request.video_id or (extract_video_id(request.url) if request.url else None)
+    if not video_id:
+        raise HTTPException(422, "Provide a YouTube 'url' or 'video_id'.")
+    if get_registry().get(video_id) is not None:
+        return _ready(video_id)
+    return _job_status(get_ingestion_queue().submit(video_id))
+
+
+@app.get("/videos/{video_id}")
+async def status(video_id: str):
+    job = get_ingestion_queue().get(video_id)
+    if job is not None:
+        return _job_status(job)
+    if get_registry().get(video_id) is not None:
+        return _ready(video_id)
+    raise HTTPException(404, f"Video '{video_id}' has not been ingested by this worker.")
+
+
+@app.post("/videos/{video_id}/query")
+async def query(video_id: str, request: QueryRequest):
+    handle = await _acquire(video_id)
+    try:
+        start = time.perf_counter()
+        answer = await handle.engine.ainvoke(_engine_input(request))
+        return {"video_id": video_id, "answer": answer, "seconds": time.perf_counter() - start}
+    finally:
+        handle.release()
+
+
+@app.post("/videos/{video_id}/stream")
+async def stream(video_id: str, request: QueryRequest):
+    handle = await _acquire(video_id)
+
+    async def tokens():
+        try:
+            async for token in handle.engine.astream(_engine_input(request)):
+                yield token
+        finally:
+            handle.release()
+
+    return StreamingResponse(tokens(), media_type="text/plain; charset=utf-8")
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "engines": get_registry().stats()["engines"]}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus():
+    return PlainTextResponse(
+        metrics.render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+# ── Internal helpers ────────────────────────────────────────────────────────
+
+async def _acquire(video_id):
+    """
+    Returns an engine handle for `video_id`, ingesting it first if this
+    worker does not have it. The caller must release the handle.
+    """
+    registry = get_registry()
+    handle = registry.get(video_id)
+    if handle is not None:
+        return handle
+
+    job = get_ingestion_queue().submit(video_id)
+    await run_in_threadpool(job.wait)
+    if job.status == FAILED:
+        raise HTTPException(422, job.error)
+
+    handle = registry.get(video_id)
+    if handle is None:
+        raise HTTPException(503, "Engine was evicted before it could be used. Retry.")
+    return handle
+
+
+def _engine_input(request):
+    if not request.history:
+        return request.question
+    return {
+        "question": request.question,
+        "history": [message.model_dump() for message in request.history],
+    }
+
+
+def _job_status(job):
+    return {
+        "video_id": job.video_id,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "error": job.error,
+        "note": job.note if job.status == DONE else None,
+        "coverage": indexing_coverage(job.video_id),
+    }
+
+
+def _ready(video_id):
+    return {
+        "video_id": video_id,
+        "status": DONE,
+        "stage": "Ready",
+        "progress": 1.0,
+        "error": None,
+        "note": None,
+        "coverage": indexing_coverage(video_id),
+    }
@@ -0,0 +1,116 @@
+import os
+from collections import namedtuple
+
+from ingestion_queue import DONE
+
+
+# Mirrors ingestion_queue.IngestionJob's fields as reported by the API,
+# plus progressive-indexing coverage once the engine is open
+RemoteJob = namedtuple(
+    "RemoteJob",
+    ["video_id", "status", "stage", "progress", "error", "note", "coverage"],
+    defaults=(None,),
+)
+
+
+class RemoteEngine:
+    """
+    Engine stand-in that answers through the HTTP API. Supports .stream()
+    and .invoke() with the same input as a local engine — a question
+    string or {"question", "history"} — so stream_answer() works on it
+    unchanged.
+    """
+
+    def __init__(self, client, video_id):
+        self.client = client
+        self.video_id = video_id
+
+    def stream(self, inputs):
+        with self.client.http.stream(
+            "POST", f"/videos/{self.video_id}/stream", json=_payload(inputs)
+        ) as response:
+            _raise_for_status(response)
+            yield from response.iter_text()
+
+    def invoke(self, inputs):
+        response = self.client.http.post(f"/videos/{self.video_id}/query", json=_payload(inputs))
+        _raise_for_status(response)
+        return response.json()["answer"]
+
+
+class RemoteHandle:
+    """
+    Same shape as engine_registry.EngineHandle. The server owns the
+    engine's lifetime, so releasing is a no-op.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.video_id = engine.video_id
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+class RecallClient:
+    """
+    Thin synchronous client for api.py, over one pooled HTTP connection.
+    """
+
+    def __init__(self, base_url, timeout=120.0):
+        import httpx
+
+        self.http = httpx.Client(base_url=base_url.rstrip("/"), timeout=timeout)
+
+    def submit(self, video_id):
+        response = self.http.post("/videos", json={"video_id": video_id})
+        _raise_for_status(response)
+        return RemoteJob(**response.json())
+
+    def status(self, video_id):
+        """
+        Returns the video's RemoteJob, or None if the server does not know it.
+        """
+        response = self.http.get(f"/videos/{video_id}")
+        if response.status_code == 404:
+            return None
+        _raise_for_status(response)
+        return RemoteJob(**response.json())
+
+    def open(self, video_id):
+        """
+        Returns a RemoteHandle if the video is ready, else None.
+        """
+        job = self.status(video_id)
+        if job is None or job.status != DONE:
+            return None
+        return RemoteHandle(RemoteEngine(self, video_id))
+
+
+def _payload(inputs):
+    if isinstance(inputs, str):
+        return {"question": inputs}
+    return {"question": inputs["question"], "history": inputs.get("history") or []}
+
+
+def _raise_for_status(response):
+    if response.status_code >= 400:
+        response.read()
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        raise RuntimeError(f"Recall API error {response.status_code}: {detail}")
+
+
+def api_client_from_env():
+    """
+    Returns a RecallClient when the UI should run as a thin client, or
+    None to run the engine in-process.
+
+    Optional env var:
+        RECALL_API_URL  — base URL of a running api.py service
+    """
+    url = os.getenv("RECALL_API_URL", "").strip()
+    return RecallClient(url) if url else None
@@ -1,10 +1,25 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from youtube_utils import extract_video_id, get_transcript
-from chatbot_engine import create_chatbot_engine
+from api_client import api_client_from_env
+from youtube_utils import extract_channel_id, extract_playlist_id, extract_video_id
+from chatbot_engine import indexing_coverage, stream_answer
+from engine_registry import get_registry
+from ingestion_queue import DONE, FAILED, get_collection_queue, get_ingestion_queue
+from metrics import metrics, start_metrics_server
+from transcript_chunking import format_timestamp
 
 load_dotenv()
+start_metrics_server()
+
+
+@st.cache_resource(show_spinner=False)
+def _load_api_client():
+    """
+    With RECALL_API_URL set the UI is a thin client of api.py; otherwise
+    engines run in this process.
+    """
+    return api_client_from_env()
 
 # ─────────────────────────────────────────────────────────────
 # PAGE CONFIG
@@ -194,6 +209,67 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 
 
+def _release_engine():
+    """
+    Drops this session's reference to its shared engine, if any.
+    """
+    handle = st.session_state.pop("engine_handle", None)
+    if handle is not None:
+        handle.release()
+
+
+def _find_engine(video_id):
+    api = _load_api_client()
+    return api.open(video_id) if api else get_registry().get(video_id)
+
+
+def _is_collection(key):
+    # Collections are keyed "playlist:<id>" / "channel:<id>"
+    return ":" in key
+
+
+def _index_coverage():
+    """
+    Indexing coverage of the open video while it is being indexed
+    progressively, else None.
+    """
+    handle = st.session_state.get("engine_handle")
+    video_id = getattr(handle, "video_id", None)
+    if video_id is None:
+        return None
+    api = _load_api_client()
+    if api:
+        job = api.status(video_id)
+        return job.coverage if job else None
+    return indexing_coverage(video_id)
+
+
+def _submit_ingestion(video_id):
+    """
+    Submits `video_id` (or a collection key) for indexing. Joins a job
+    that is already queued, running or done; a failed one is retried.
+    """
+    if _is_collection(video_id):
+        return get_collection_queue().submit(video_id)
+    api = _load_api_client()
+    if api:
+        return api.submit(video_id)
+    return get_ingestion_queue().submit(video_id)
+
+
+def _ingestion_job(video_id):
+    """
+    Current job for `video_id` when polling. A failed job is returned
+    as is, so polling never retries it; only a job that has expired is
+    submitted again.
+    """
+    api = _load_api_client()
+    if api and not _is_collection(video_id):
+        return api.status(video_id) or api.submit(video_id)
+    queue = get_collection_queue() if _is_collection(video_id) else get_ingestion_queue()
+    return queue.get(video_id) or queue.submit(video_id)
+
+
 # ─────────────────────────────────────────────────────────────
 # HEADER
 # ─────────────────────────────────────────────────────────────
@@ -241,29 +317,40 @@ def landing_ui():
                 st.warning("Please enter a valid YouTube URL.")
                 return
 
-            with st.spinner("Decoding video signal & indexing context..."):
-                video_id = extract_video_id(url)
-
-                if not video_id:
-                    st.error("Protocol Error: Invalid YouTube URL format.")
-                    return
-
-                text, err = get_transcript(video_id)
+            video_id = extract_video_id(url)
+            playlist_id = extract_playlist_id(url)
+            channel_id = extract_channel_id(url)
 
-                if err and not text:
-                    st.error(f"Transcript Failure: {err}")
+            # A bare playlist or channel URL loads its videos into one
+            # collection, indexed in the background like a single video.
+            if (playlist_id or channel_id) and not video_id:
+                if _load_api_client():
+                    st.warning("Playlists and channels are not available through the Recall API yet.")
                     return
+                key = f"playlist:{playlist_id}" if playlist_id else f"channel:{channel_id}"
+                _submit_ingestion(key)
+                st.session_state.pending_video = (key, None)
 
-                engine = create_chatbot_engine(text)
-
-                st.session_state.core_engine = engine
-                st.session_state.current_video_url = url
-                st.session_state.chunk_count = len(text.split()) // 150
-                st.session_state.messages = []
-                st.session_state.ready = True
+            elif not video_id:
+                st.error("Protocol Error: Invalid YouTube URL format.")
+                return
 
-                st.toast("Neural Engine Ready")
-                st.rerun()
+            else:
+                # Engines are shared across sessions — another user may
+                # already have indexed this video in this process.
+                handle = _find_engine(video_id)
+                if handle is not None:
+                    _open_engine(handle, url)
+
+                # Otherwise index in the background; concurrent requests for
+                # the same video share one job.
+                _submit_ingestion(video_id)
+                st.session_state.pending_video = (video_id, url)
+
+        if st.session_state.get("ingest_error"):
+            st.error(st.session_state.pop("ingest_error"))
+        if st.session_state.get("pending_video"):
+            _ingestion_progress()
         
         st.markdown("""
         <div style="margin-top: 2rem; padding-top: 1.5rem; border-top: 1px solid var(--glass-border);">
@@ -275,6 +362,61 @@ def landing_ui():
         st.markdown("</div>", unsafe_allow_html=True)
 
 
+@st.fragment(run_every=1.0)
+def _ingestion_progress():
+    """
+    Polls the background ingestion job for the pending video or
+    collection, re-running only this fragment until the engine is ready.
+    """
+    pending = st.session_state.get("pending_video")
+    if not pending:
+        return
+    video_id, url = pending
+    job = _ingestion_job(video_id)
+
+    if job.status == FAILED:
+        _end_ingestion(f"Transcript Failure: {job.error}")
+
+    if job.status == DONE:
+        collection_size = None
+        if _is_collection(video_id):
+            # A collection job's note is the list of its video IDs
+            handle = get_registry().get(video_id)
+            url = f"https://www.youtube.com/watch?v={job.note[0]}"
+            collection_size = len(job.note)
+        else:
+            handle = _find_engine(video_id)
+        if handle is None:
+            _end_ingestion("Engine was evicted before it could be opened. Please try again.")
+        st.session_state.pending_video = None
+        _open_engine(handle, url, collection_size=collection_size)
+
+    st.progress(job.progress, text=job.stage)
+
+
+def _end_ingestion(error):
+    """
+    Stops polling and shows `error` on a full rerun, which also
+    unschedules the progress fragment.
+    """
+    st.session_state.pending_video = None
+    st.session_state.ingest_error = error
+    st.rerun()
+
+
+def _open_engine(handle, url, collection_size=None):
+    _release_engine()
+    st.session_state.engine_handle = handle
+    st.session_state.current_video_url = url
+    st.session_state.collection_size = collection_size
+    st.session_state.messages = []
+    st.session_state.last_timings = None
+    st.session_state.ready = True
+
+    st.toast("Neural Engine Ready")
+    st.rerun()
+
+
 # ─────────────────────────────────────────────────────────────
 # DASHBOARD UI
 # ─────────────────────────────────────────────────────────────
@@ -309,11 +451,29 @@ def dashboard_ui():
             <div class="metric-value">{len(st.session_state.messages)} Messages</div>
         </div>
         """, unsafe_allow_html=True)
+
+        if st.session_state.get("collection_size"):
+            st.markdown(f"""
+            <div class="metric-item">
+                <div class="metric-label">Collection</div>
+                <div class="metric-value">{st.session_state.collection_size} Videos</div>
+            </div>
+            """, unsafe_allow_html=True)
+
+        timings = st.session_state.get("last_timings")
+        if timings:
+            st.markdown(f"""
+            <div class="metric-item">
+                <div class="metric-label">Last Response</div>
+                <div class="metric-value">{timings["ttft"]:.2f}s to first token · {timings["total"]:.2f}s total</div>
+            </div>
+            """, unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
         col_a, col_b = st.columns(2)
         with col_a:
             if st.button("New Video"):
+                _release_engine()
                 st.session_state.ready = False
                 st.rerun()
         with col_b:
@@ -321,11 +481,17 @@ def dashboard_ui():
                 st.session_state.messages = []
                 st.rerun()
 
+        _metrics_panel()
+
     # ───── RIGHT PANEL ─────
     with right:
         st.markdown('<div class="premium-card" style="height: 100%;">', unsafe_allow_html=True)
         st.markdown("### Video Dialogue", unsafe_allow_html=True)
 
+        coverage = _index_coverage()
+        if coverage is not None and not coverage["complete"]:
+            _coverage_note()
+
         chat_container = st.container()
 
         with chat_container:
@@ -339,18 +505,92 @@ def dashboard_ui():
             )
 
             with st.chat_message("assistant"):
-                with st.spinner("Analyzing context..."):
-                    response = st.session_state.core_engine.invoke(prompt)
-                    st.markdown(response)
-                    st.session_state.messages.append(
-                        {"role": "assistant", "content": response}
+                # Tokens render as they arrive instead of behind a spinner
+                # Earlier turns let follow-ups ("what did he say after
+                # that?") resolve against the conversation
+                timings = {}
+                response = st.write_stream(
+                    stream_answer(
+                        st.session_state.engine_handle.engine,
+                        prompt,
+                        timings,
+                        history=st.session_state.messages[:-1],
                     )
+                )
+                st.session_state.messages.append(
+                    {"role": "assistant", "content": response}
+                )
+                st.session_state.last_timings = timings
 
             st.rerun()
 
         st.markdown("</div>", unsafe_allow_html=True)
 
 
+@st.fragment(run_every=2.0)
+def _coverage_note():
+    """
+    Says how much of a long video answers can draw on while the rest is
+    still being indexed; reruns the page once indexing completes.
+    """
+    coverage = _index_coverage()
+    if coverage is None or coverage["complete"]:
+        st.rerun()
+
+    percent = int(coverage["fraction"] * 100)
+    until = f" (up to {format_timestamp(coverage['until'])})" if coverage["until"] is not None else ""
+    if coverage["error"]:
+        st.warning(
+            f"Indexing stopped at {percent}% of the video{until}: {coverage['error']}. "
+            "Answers cover only that part."
+        )
+    else:
+        st.progress(
+            coverage["fraction"],
+            text=f"Indexed {percent}% of the video{until} — answers cover only that part for now.",
+        )
+
+
+def _metrics_panel():
+    """
+    Per-stage latency and cache counters for this process — where a
+    response's time actually went.
+    """
+    with st.expander("Pipeline Metrics"):
+        snap = metrics.snapshot()
+        if not snap["timings"]:
+            st.caption("No stages recorded yet.")
+            return
+
+        st.dataframe(
+            [
+                {
+                    "stage": stage,
+                    "count": t["count"],
+                    "p50 (ms)": round(t["p50"] * 1000, 1),
+                    "p95 (ms)": round(t["p95"] * 1000, 1),
+                }
+                for stage, t in sorted(snap["timings"].items())
+            ],
+            hide_index=True,
+        )
+
+        sizes = {
+            name: round(v["mean"], 3)
+            for name, v in sorted(snap["values"].items())
+        }
+        counts = {**snap["counters"], **snap["gauges"]}
+        if sizes:
+            st.caption("Mean per operation")
+            st.json(sizes, expanded=False)
+        if counts:
+            st.caption("Counters & cache gauges")
+            st.json(dict(sorted(counts.items())), expanded=False)
+
+        st.caption("Recent traces")
+        st.json(metrics.recent_traces(limit=20), expanded=False)
+
+
 # ─────────────────────────────────────────────────────────────
 # MAIN
 # ─────────────────────────────────────────────────────────────
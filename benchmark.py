@@ -0,0 +1,347 @@
+"""
+Offline benchmark for the ingestion and query pipeline.
+
+Builds an engine with create_chatbot_engine() over synthetic transcripts
+of real-world lengths and asks labeled questions against it, using a
+hashing embedder and a canned LLM so no network or API key is needed.
+
+    python benchmark.py                       # all cases, table to stdout
+    python benchmark.py --cases 10min,1h      # a subset
+    python benchmark.py --save bench.json     # record a baseline
+    python benchmark.py --baseline bench.json # exit 1 on regression
+    python benchmark.py --lean                # lean engine: slim docstore, float16
+
+Pipeline knobs (RECALL_RETRIEVAL_K, RECALL_HYBRID_RETRIEVAL,
+RECALL_CONTEXT_TOKEN_BUDGET, ...) are read from the environment as usual,
+so the effect of a change is one run with and one without it. Token
+counts use the offline chars/4 estimate unless RECALL_TOKENIZER=tiktoken
+is set.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+# name -> transcript length in minutes
+CASES = {"10min": 10, "1h": 60, "4h": 240}
+
+SEGMENT_SECONDS = 5.0
+WORDS_PER_SEGMENT = 12          # ~145 spoken words per minute
+FACT_EVERY_MINUTES = 2
+MAX_QUESTIONS = 50
+EMBEDDING_DIM = 384             # same width as all-MiniLM-L6-v2
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words feature hashing. Stands in for the real
+    embedding model: same vector width, zero network, and lexically
+    similar texts land close together.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, latency=0.0):
+        self.dim = dim
+        self.latency = latency
+
+    def _embed(self, text):
+        from hybrid_retrieval import STOPWORDS, tokenize
+
+        vector = np.zeros(self.dim, dtype="float32")
+        for token in tokenize(text):
+            if token in STOPWORDS:
+                continue
+            h = zlib.crc32(token.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+
+# ── Corpus ──────────────────────────────────────────────────────────────────
+
+_SYLLABLES = [
+    "ka", "lo", "mi", "ner", "tor", "vi", "sa", "quen", "dra", "pel",
+    "shu", "ri", "gon", "tal", "bex", "or", "fin", "zu", "mar", "cle",
+]
+_FILLER = (
+    "so the next thing we want to look at is how this part of the system "
+    "actually behaves when you push it a little further than the example "
+    "and you can see that the numbers start to move in a way that is not "
+    "obvious from the first slide which is why we spend time on it here "
+    "because most people skip this step and then wonder later what went "
+    "wrong with their results in practice"
+).split()
+
+
+def _word(rng, syllables=3):
+    return "".join(rng.choice(_SYLLABLES) for _ in range(syllables))
+
+
+def synthetic_transcript(minutes, seed=0):
+    """
+    Returns (segments, questions) for a transcript of `minutes` length.
+
+    Filler speech is interleaved with planted facts — one every couple of
+    minutes — each phrased so exactly one segment answers it. A question
+    is {"question", "start"}: the planted segment's start time.
+    """
+    from youtube_utils import Segment
+
+    rng = random.Random(seed)
+    vocab = [_word(rng, 2) for _ in range(400)]
+    total = int(minutes * 60 / SEGMENT_SECONDS)
+    fact_every = int(FACT_EVERY_MINUTES * 60 / SEGMENT_SECONDS)
+
+    segments, questions = [], []
+    for i in range(total):
+        start = i * SEGMENT_SECONDS
+        if i % fact_every == fact_every // 2:
+            entity, place = _word(rng), _word(rng, 2)
+            year = rng.randint(1850, 2020)
+            text = f"the {entity} protocol was first described in {year} by researchers in {place}"
+            questions.append({"question": f"When was the {entity} protocol first described?", "start": start})
+        else:
+            words = [rng.choice(_FILLER) for _ in range(WORDS_PER_SEGMENT - 3)]
+            words += [rng.choice(vocab) for _ in range(3)]
+            rng.shuffle(words)
+            text = " ".join(words)
+        segments.append(Segment(start, start + SEGMENT_SECONDS, text))
+
+    step = max(1, len(questions) // MAX_QUESTIONS)
+    return segments, questions[::step][:MAX_QUESTIONS]
+
+
+# ── Running a case ──────────────────────────────────────────────────────────
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _peak_rss_mb():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _hit(docs, start):
+    return any(
+        doc.metadata.get("start", -1) <= start < doc.metadata.get("end", -1)
+        for doc in docs
+    )
+
+
+def run_case(name, minutes, repeats=3, embed_latency=0.0, llm_latency=0.0, lean=False):
+    """
+    Runs one case in the current process and returns its measurements.
+    Meant to be called in a fresh process so peak RSS and import time
+    are per case.
+    """
+    # Measure the pipeline itself, not the caches in front of it
+    os.environ["RECALL_INDEX_CACHE_MAX_MB"] = "0"
+    os.environ["RECALL_ANSWER_CACHE_SIZE"] = "0"
+    os.environ["RECALL_SUMMARY_MODE"] = "off"
+    os.environ["RECALL_LEAN_ENGINE"] = "1" if lean else "0"
+    # Same token counts with or without network (tiktoken fetches its BPE
+    # file on first use), so results compare across machines
+    os.environ.setdefault("RECALL_TOKENIZER", "estimate")
+
+    start = time.perf_counter()
+    import chatbot_engine
+    import_seconds = time.perf_counter() - start
+
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    from lean_store import LeanVectorStore
+    from metrics import metrics
+    from query_cache import CachedQueryEmbeddings
+
+    embeddings = CachedQueryEmbeddings(HashingEmbeddings(latency=embed_latency))
+    llm = FakeListChatModel(
+        responses=["The answer is in the context [0:00]."], sleep=llm_latency or None
+    )
+    chatbot_engine._load_embeddings = lambda: embeddings
+    chatbot_engine._load_llm = lambda: llm
+
+    segments, questions = synthetic_transcript(minutes)
+    video_id = f"bench-{name}"
+
+    start = time.perf_counter()
+    vector_store = chatbot_engine.build_vector_store(segments, video_id=video_id)
+    retriever = chatbot_engine.build_retriever(vector_store)
+    engine = chatbot_engine.create_chatbot_engine(
+        segments, video_id=video_id, vector_store=vector_store, retriever=retriever
+    )
+    build_seconds = time.perf_counter() - start
+
+    hits = sum(_hit(retriever.invoke(q["question"]), q["start"]) for q in questions)
+
+    latencies = []
+    for _ in range(repeats):
+        for q in questions:
+            t = time.perf_counter()
+            engine.invoke(q["question"])
+            latencies.append(time.perf_counter() - t)
+
+    if isinstance(vector_store, LeanVectorStore):
+        chunks, index_type, index_bytes = len(vector_store.docstore), "lean-fp16", vector_store.vectors.nbytes
+    else:
+        import faiss
+        from vector_index import index_type_of
+
+        chunks, index_type = vector_store.index.ntotal, index_type_of(vector_store.index)
+        index_bytes = len(faiss.serialize_index(vector_store.index))
+
+    stages = metrics.snapshot()["timings"]
+    return {
+        "case": name,
+        "minutes": minutes,
+        "chunks": chunks,
+        "index_type": index_type,
+        "questions": len(questions),
+        "import_seconds": import_seconds,
+        "build_seconds": build_seconds,
+        "peak_rss_mb": _peak_rss_mb(),
+        "index_mb": index_bytes / (1024 * 1024),
+        "resident_mb": chatbot_engine.vector_store_bytes(vector_store) / (1024 * 1024),
+        "query_p50_ms": _percentile(latencies, 0.5) * 1000,
+        "query_p95_ms": _percentile(latencies, 0.95) * 1000,
+        "recall_at_k": hits / len(questions) if questions else 0.0,
+        "k": int(os.getenv("RECALL_RETRIEVAL_K", 6)),
+        "stage_p50_ms": {
+            stage: t["p50"] * 1000
+            for stage, t in sorted(stages.items())
+            if stage.startswith("query.")
+        },
+    }
+
+
+def run(cases, **kwargs):
+    """
+    Runs each case in its own spawned process and returns the results.
+    """
+    results = []
+    for name in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results.append(pool.submit(run_case, name, CASES[name], **kwargs).result())
+    return results
+
+
+# ── Reporting ───────────────────────────────────────────────────────────────
+
+_COLUMNS = [
+    ("case", "{}"),
+    ("chunks", "{}"),
+    ("index_type", "{}"),
+    ("import_seconds", "{:.2f}"),
+    ("build_seconds", "{:.2f}"),
+    ("peak_rss_mb", "{:.0f}"),
+    ("index_mb", "{:.2f}"),
+    ("resident_mb", "{:.2f}"),
+    ("query_p50_ms", "{:.1f}"),
+    ("query_p95_ms", "{:.1f}"),
+    ("recall_at_k", "{:.2f}"),
+]
+
+
+def format_table(results):
+    rows = [[name for name, _ in _COLUMNS]]
+    rows += [[fmt.format(r[name]) for name, fmt in _COLUMNS] for r in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(_COLUMNS))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths))
+        for row in rows
+    )
+
+
+def compare(results, baseline, tolerance=0.25, recall_drop=0.02):
+    """
+    Returns a list of regressions against a saved baseline: build time or
+    query p95 more than `tolerance` slower, index larger, or recall@k
+    more than `recall_drop` lower.
+    """
+    previous = {r["case"]: r for r in baseline}
+    problems = []
+    for r in results:
+        old = previous.get(r["case"])
+        if old is None:
+            continue
+        for key in ("build_seconds", "query_p95_ms", "index_mb"):
+            if r[key] > old[key] * (1 + tolerance):
+                problems.append(f"{r['case']}: {key} {old[key]:.2f} -> {r[key]:.2f}")
+        if r["recall_at_k"] < old["recall_at_k"] - recall_drop:
+            problems.append(
+                f"{r['case']}: recall_at_k {old['recall_at_k']:.2f} -> {r['recall_at_k']:.2f}"
+            )
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", default=",".join(CASES),
+                        help=f"comma-separated subset of {', '.join(CASES)}")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="passes over the question set per case")
+    parser.add_argument("--embed-latency", type=float, default=0.0,
+                        help="simulated seconds per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="simulated seconds per streamed LLM token")
+    parser.add_argument("--lean", action="store_true",
+                        help="run with RECALL_LEAN_ENGINE=1 (slim docstore, float16 vectors)")
+    parser.add_argument("--save", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against a saved JSON run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown vs the baseline (default 0.25)")
+    args = parser.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    results = run(
+        cases,
+        repeats=args.repeats,
+        embed_latency=args.embed_latency,
+        llm_latency=args.llm_latency,
+        lean=args.lean,
+    )
+    print(format_table(results))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(results, json.load(f), tolerance=args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
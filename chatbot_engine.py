@@ -1,54 +1,497 @@
+import time
+
+# Import time of this module is reported as the startup.import stage. The
+# heavy backends (FAISS, langchain_community, langchain_huggingface,
+# langchain_text_splitters, Groq) are imported on first use instead.
+_import_started = time.perf_counter()
+
+import json
 import os
+import weakref
 import streamlit as st
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnableParallel, RunnablePassthrough, RunnableLambda
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
+from context_packer import count_tokens, pack_context, token_budget_from_env
+from conversation import QueryRewriter, conversation_config_from_env, format_history, split_input
+from engine_registry import get_registry
+from embedding_client import InferenceEndpointEmbeddings, batched_embeddings_from_env
+from hybrid_retrieval import HybridRetriever
+from index_cache import index_cache_from_env, make_cache_key
+from lean_store import LeanVectorStore, lean_engine_from_env
+from llm_router import llm_router_from_env
+from local_embeddings import local_embeddings_from_env
+from metrics import metrics
+from progressive_index import ProgressiveIndex, progressive_config_from_env
+from query_cache import CachedQueryEmbeddings, answer_cache_from_env
+from retrieval_batcher import BatchedQueryEmbeddings, BatchedSearchStore, batching_config_from_env
+from reranker import OnnxCrossEncoder, RerankingRetriever, rerank_config_from_env
+from summarizer import VideoSummarizer, is_summary_query, summary_mode_from_env
+from transcript_chunking import chunk_segments, format_timestamp
+from transcript_cleaning import (
+    CLEANING_VERSION, clean_segments, clean_text, cleaning_config_from_env, drop_near_duplicates,
+)
+from vector_index import (
+    build_index, choose_index_type, configure_search, index_bytes,
+    index_config_from_env, recall_vs_flat,
+)
+from video_collection import VideoCollection
+from youtube_utils import get_channel_upload_ids, get_playlist_video_ids, get_transcript_segments
+
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SPLITTER_PARAMS = {"chunk_size": 1000, "chunk_overlap": 200}
+SEGMENT_CHUNK_PARAMS = {"chunker": "segments", "chunk_size": 1000}
+EMBEDDING_BACKENDS = ("hf_api", "onnx", "onnx_int8")
+
+# video_id -> ProgressiveIndex, kept only as long as its engine is alive
+_progressive_indexes = weakref.WeakValueDictionary()
+
+
+def _embedding_backend():
+    backend = os.getenv("RECALL_EMBEDDING_BACKEND", "hf_api").strip().lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown RECALL_EMBEDDING_BACKEND '{backend}'. "
+            f"Choose one of: {', '.join(EMBEDDING_BACKENDS)}."
+        )
+    return backend
+
+
+def _embedding_id():
+    """
+    Identifies the vectors an index was built with. The int8 model yields
+    slightly different vectors, so its indexes are cached separately.
+    """
+    if _embedding_backend() == "onnx_int8":
+        return f"{EMBEDDING_MODEL}@int8"
+    return EMBEDDING_MODEL
 
 
 @st.cache_resource(show_spinner="Connecting to embedding service...")
 def _load_embeddings():
     """
-    Uses the HuggingFace Inference API — the model runs on HF's servers,
-    not locally. This means zero local RAM is used for the embedding model,
-    solving the 512 MB OOM on Render's free tier.
+    By default uses the HuggingFace Inference API — the model runs on HF's
+    servers, not locally. This means zero local RAM is used for the
+    embedding model, solving the 512 MB OOM on Render's free tier.
+
+    Chunks are sent in batches over a small thread pool with retry on
+    rate limits (see embedding_client.py).
 
-    Required env var:
+    Self-hosted deployments with a few GB of RAM can instead run the same
+    MiniLM model on the local CPU via onnxruntime (see local_embeddings.py),
+    which takes the network off the query path entirely.
+
+    Either way, query embeddings are memoised in an LRU so a repeated
+    question never pays for a second embedding call, and cache misses
+    from concurrent sessions are embedded together in one micro-batch
+    (see retrieval_batcher.py).
+
+    Required env var (hf_api backend):
         HUGGINGFACEHUB_API_TOKEN  — free token from huggingface.co/settings/tokens
+
+    Optional env vars:
+        RECALL_EMBEDDING_BACKEND  — hf_api (default) | onnx | onnx_int8
+        HF_EMBEDDINGS_URL         — explicit feature-extraction endpoint URL
+                                    (dedicated endpoint, TEI server, local stand-in)
+    """
+    backend = _embedding_backend()
+    if backend != "hf_api":
+        embeddings = local_embeddings_from_env(
+            EMBEDDING_MODEL, quantized=(backend == "onnx_int8")
+        )
+    else:
+        api_token = os.getenv("HUGGINGFACEHUB_API_TOKEN", "")
+        endpoint_url = os.getenv("HF_EMBEDDINGS_URL", "")
+        if endpoint_url:
+            base = InferenceEndpointEmbeddings(endpoint_url, api_token=api_token)
+        else:
+            from langchain_huggingface import HuggingFaceEndpointEmbeddings
+
+            base = HuggingFaceEndpointEmbeddings(
+                model=EMBEDDING_MODEL,
+                huggingfacehub_api_token=api_token
+            )
+        embeddings = batched_embeddings_from_env(base)
+
+    batching = batching_config_from_env()
+    if batching is not None:
+        window, max_batch = batching
+        embeddings = BatchedQueryEmbeddings(embeddings, window=window, max_batch=max_batch)
+
+    cached = CachedQueryEmbeddings(
+        embeddings, maxsize=int(os.getenv("RECALL_QUERY_EMBED_CACHE_SIZE", 2048))
+    )
+    metrics.register_collector(lambda: _cache_gauges("query_embed_cache", cached.stats))
+    return cached
+
+
+@st.cache_resource(show_spinner=False)
+def _load_index_cache():
+    return index_cache_from_env()
+
+
+@st.cache_resource(show_spinner=False)
+def _load_answer_cache():
+    answer_cache = answer_cache_from_env()
+    if answer_cache is not None:
+        metrics.register_collector(lambda: _cache_gauges("answer_cache", answer_cache.stats))
+    return answer_cache
+
+
+def _cache_gauges(name, stats):
+    snap = stats.snapshot()
+    return {
+        f"{name}.hits": snap["hits"],
+        f"{name}.misses": snap["misses"],
+        f"{name}.hit_rate": snap["hit_rate"],
+    }
+
+
+def split_transcript(transcript, video_id=None):
+    """
+    Chunks a transcript given either as plain text or as a list of timed
+    Segments. Segments are packed on caption boundaries with start/end
+    times in metadata; plain text goes through the character splitter.
+
+    Captions are sanitised first (non-speech tags, rolling duplicates)
+    and near-duplicate chunks are dropped, per cleaning_config_from_env().
+    """
+    config = cleaning_config_from_env()
+    if isinstance(transcript, str):
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        if config["clean"]:
+            transcript = clean_text(transcript)
+        splitter = RecursiveCharacterTextSplitter(**SPLITTER_PARAMS)
+        chunks = splitter.create_documents([transcript])
+    else:
+        if config["clean"]:
+            transcript = clean_segments(transcript)
+        chunks = chunk_segments(
+            transcript, chunk_size=SEGMENT_CHUNK_PARAMS["chunk_size"], video_id=video_id
+        )
+    if config["dedup_threshold"] > 0:
+        chunks = drop_near_duplicates(chunks, config["dedup_threshold"])
+    return chunks
+
+
+def _index_cache_key(transcript, video_id):
+    """
+    Key of the cached index for this transcript, or None when the index
+    cache is disabled or there is no video ID.
+    """
+    if _load_index_cache() is None or not video_id:
+        return None
+    if isinstance(transcript, str):
+        content, params = transcript, SPLITTER_PARAMS
+    else:
+        content, params = json.dumps(transcript), SEGMENT_CHUNK_PARAMS
+    params = {**params, "cleaning": {**cleaning_config_from_env(), "version": CLEANING_VERSION}}
+    index_type, budget = index_config_from_env()
+    if lean_engine_from_env():
+        params = {**params, "lean": True}
+    elif index_type != "auto" or budget:
+        params = {**params, "index": index_type, "index_budget": budget}
+    return make_cache_key(video_id, content, _embedding_id(), params)
+
+
+def _compress_index(vector_store):
+    """
+    Swaps the flat float32 index LangChain builds for the configured (or
+    automatically chosen) index type. Row order — and so the docstore
+    mapping — is unchanged. Returns (index_type, recall_vs_flat).
+    """
+    index_type, budget = index_config_from_env()
+    n, dim = vector_store.index.ntotal, vector_store.index.d
+    if index_type == "auto":
+        index_type = choose_index_type(n, dim, budget)
+    if index_type == "flat" or n == 0:
+        return "flat", 1.0
+
+    with metrics.trace("index.compress", index_type=index_type) as span:
+        vectors = vector_store.index.reconstruct_n(0, n)
+        vector_store.index = build_index(index_type, vectors)
+        span["recall_vs_flat"] = recall_vs_flat(vector_store.index, vectors)
+    return index_type, span["recall_vs_flat"]
+
+
+def _load_cached_store(cache_key, report):
+    """
+    Cached FAISS store for `cache_key`, or None on a miss (or no cache).
+    """
+    if cache_key is None:
+        return None
+    report("Loading cached index", 0.3)
+    with metrics.trace("index.cache_load") as span:
+        vector_store = _load_index_cache().load(cache_key, _load_embeddings())
+        span["hit"] = int(vector_store is not None)
+    if vector_store is not None and not isinstance(vector_store, LeanVectorStore):
+        configure_search(vector_store.index)
+    return vector_store
+
+
+def _finish_index(vector_store, cache_key, video_id):
     """
-    return HuggingFaceEndpointEmbeddings(
-        model="sentence-transformers/all-MiniLM-L6-v2",
-        huggingfacehub_api_token=os.getenv("HUGGINGFACEHUB_API_TOKEN", "")
+    Compresses a freshly built index and saves it to the index cache.
+    """
+    # ── 2b. Compression (HNSW / IVF-PQ / scalar-quantized, per size) ────────
+    if isinstance(vector_store, LeanVectorStore):
+        vector_store.compact()
+        index_type, recall = "lean-fp16", 1.0
+    else:
+        index_type, recall = _compress_index(vector_store)
+
+    if cache_key is not None:
+        _load_index_cache().save(
+            cache_key,
+            vector_store,
+            meta={"video_id": video_id, "index_type": index_type, "recall_vs_flat": recall},
+        )
+
+
+def build_vector_store(transcript, video_id=None, report=None):
+    """
+    Returns the FAISS store for a transcript (text or Segments), reusing a
+    cached index when the same video, transcript, model and splitter
+    settings were indexed before. Without a video_id the index is always
+    built fresh.
+
+    `report(stage, progress)`, if given, is called as each stage starts.
+    """
+    report = report or (lambda stage, progress=None: None)
+    cache_key = _index_cache_key(transcript, video_id)
+    vector_store = _load_cached_store(cache_key, report)
+    if vector_store is None:
+        chunks = _chunk_transcript(transcript, video_id, report)
+        vector_store = _embed_chunks(chunks, cache_key, video_id, report)
+    return vector_store
+
+
+def _chunk_transcript(transcript, video_id, report):
+    # ── 1. Chunking ──────────────────────────────────────────────────────────
+    report("Chunking transcript", 0.25)
+    with metrics.trace("index.chunk") as span:
+        chunks = split_transcript(transcript, video_id=video_id)
+        span["chunks"] = len(chunks)
+    return chunks
+
+
+def _embed_chunks(chunks, cache_key, video_id, report):
+    # ── 2. Embeddings (HF Inference API by default, or local ONNX) ──────────
+    report(f"Embedding {len(chunks)} chunks", 0.35)
+    with metrics.trace("index.embed", chunks=len(chunks)):
+        vector_store = _vector_store_class().from_documents(chunks, _load_embeddings())
+
+    _finish_index(vector_store, cache_key, video_id)
+    return vector_store
+
+
+def _vector_store_class():
+    """
+    LeanVectorStore in lean engine mode (RECALL_LEAN_ENGINE=1), else FAISS.
+    """
+    if lean_engine_from_env():
+        return LeanVectorStore
+    from langchain_community.vectorstores import FAISS
+
+    return FAISS
+
+
+def _start_progressive_index(chunks, cache_key, video_id, config, report):
+    """
+    Embeds `chunks` in the background and returns their ProgressiveIndex
+    once the first batch is searchable. When the last batch is in, the
+    index is compressed and cached like a fully built one, and queries
+    switch to the full retriever.
+    """
+    def finish(vector_store):
+        _finish_index(vector_store, cache_key, video_id)
+        return _base_retriever(vector_store)
+
+    report(f"Embedding the first {min(config['first_batch'], len(chunks))} of {len(chunks)} chunks", 0.35)
+    progressive = ProgressiveIndex(
+        chunks,
+        _load_embeddings(),
+        first_batch=config["first_batch"],
+        batch_size=config["batch_size"],
+        finish=finish,
+        store_class=_vector_store_class(),
+    ).start()
+    progressive.wait_ready()
+    if video_id:
+        _progressive_indexes[video_id] = progressive
+    return progressive
+
+
+def indexing_coverage(video_id):
+    """
+    ProgressiveIndex.coverage() for a video this process is indexing (or
+    has indexed) progressively, or None — built up front, or its engine
+    is gone.
+    """
+    progressive = _progressive_indexes.get(video_id)
+    return progressive.coverage() if progressive is not None else None
+
+
+@st.cache_resource(show_spinner=False)
+def _load_llm():
+    """
+    One LLM router per process, shared by every engine and session. It
+    fails over between the backends in RECALL_LLM_BACKENDS (Groq by
+    default; Ollama or any OpenAI-compatible server to run offline).
+    """
+    return llm_router_from_env()
+
+
+def vector_store_bytes(vector_store):
+    """
+    Rough resident size of a FAISS store: the index (compressed or not)
+    plus chunk text. Lean stores report their exact array sizes.
+    """
+    if isinstance(vector_store, LeanVectorStore):
+        return vector_store.nbytes
+    vector_bytes = index_bytes(vector_store.index)
+    text_bytes = sum(
+        len(doc.page_content.encode("utf-8"))
+        for doc in vector_store.docstore._dict.values()
     )
+    return vector_bytes + text_bytes
 
 
-def create_chatbot_engine(full_text):
-    # ── 1. Text splitting ────────────────────────────────────────────────────
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.create_documents([full_text])
+def _create_summarizer(transcript, video_id, vector_store, llm, chunks=None):
+    """
+    Map-reduce summarizer over the chunks in transcript order — `chunks`
+    when given (an index still being built holds only some of them), else
+    the stored ones — persisted next to the cached index when there is one.
+    """
+    mode = summary_mode_from_env()
+    if mode == "off":
+        return None
 
-    # ── 2. Embeddings via HuggingFace Inference API (no local model load) ────
-    embeddings = _load_embeddings()
-    vector_store = FAISS.from_documents(chunks, embeddings)
+    if chunks is not None:
+        docs = chunks
+    elif isinstance(vector_store, LeanVectorStore):
+        docs = vector_store.docstore    # materialises Documents only while summarising
+    else:
+        docs = [
+            vector_store.docstore.search(vector_store.index_to_docstore_id[i])
+            for i in range(vector_store.index.ntotal)
+        ]
 
-    # ── 3. Retriever ─────────────────────────────────────────────────────────
-    retriever = vector_store.as_retriever(
+    cache = _load_index_cache()
+    cache_key = _index_cache_key(transcript, video_id)
+    load = save = None
+    if cache_key is not None:
+        load = lambda: cache.load_json(cache_key, "summary")
+        save = lambda result: cache.save_json(cache_key, "summary", result)
+
+    summarizer = VideoSummarizer(docs, llm, load=load, save=save)
+    if mode == "eager":
+        summarizer.ensure()
+    return summarizer
+
+
+class _LLMTimer:
+    """
+    Records query.llm (with ttft) once the token stream ends, however
+    it ends — a consumer may stop reading mid-answer.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ttft = None
+
+    def token(self, token):
+        if self.ttft is None and token:
+            self.ttft = time.perf_counter() - self.start
+
+    def finish(self):
+        seconds = time.perf_counter() - self.start
+        metrics.record_span(
+            "query.llm", seconds, {"ttft": self.ttft if self.ttft is not None else seconds}
+        )
+
+
+@st.cache_resource(show_spinner=False)
+def _load_reranker():
+    """
+    One cross-encoder per process, or None when reranking is off. The
+    model loads on the first reranked question; until it is ready those
+    questions fall back to the retriever's own order.
+    """
+    config = rerank_config_from_env()
+    if config is None:
+        return None
+    return OnnxCrossEncoder(config["model_name"], num_threads=config["num_threads"])
+
+
+def _retrieval_k():
+    """
+    Chunks to fetch per question — more when a reranker will cut them down.
+    """
+    k = int(os.getenv("RECALL_RETRIEVAL_K", 6))
+    config = rerank_config_from_env()
+    return max(k, config["fetch_k"]) if config else k
+
+
+def _with_reranker(retriever):
+    config = rerank_config_from_env()
+    if config is None:
+        return retriever
+    return RerankingRetriever(
+        base=retriever,
+        reranker=_load_reranker(),
+        top_n=config["top_n"],
+        budget=config["budget"],
+    )
+
+
+def _search_store(vector_store):
+    """
+    `vector_store`, or a view of it that micro-batches concurrent searches
+    from every session sharing the engine.
+    """
+    batching = batching_config_from_env()
+    if batching is None:
+        return vector_store
+    window, max_batch = batching
+    return BatchedSearchStore(vector_store, window=window, max_batch=max_batch)
+
+
+def _base_retriever(vector_store):
+    k = _retrieval_k()
+    search_store = _search_store(vector_store)
+    if os.getenv("RECALL_HYBRID_RETRIEVAL", "1") != "0":
+        return HybridRetriever.from_vector_store(
+            vector_store, search_store=search_store, k=k, fetch_k=max(20, k)
+        )
+    return search_store.as_retriever(
         search_type='similarity',
-        search_kwargs={'k': 6}
+        search_kwargs={'k': k}
     )
 
+
+def build_retriever(vector_store):
+    """
+    The retriever an engine uses over `vector_store`: BM25 + vector fused
+    with reciprocal rank fusion, or plain similarity search when
+    RECALL_HYBRID_RETRIEVAL=0 — followed by cross-encoder reranking when
+    RECALL_RERANK=1.
+    """
+    return _with_reranker(_base_retriever(vector_store))
+
+
+def create_chatbot_engine(transcript, video_id=None, vector_store=None, retriever=None, chunks=None):
+    if vector_store is None:
+        vector_store = build_vector_store(transcript, video_id=video_id)
+
+    # ── 3. Retriever (BM25 + vector, fused with reciprocal rank fusion) ──────
+    if retriever is None:
+        retriever = build_retriever(vector_store)
+
     # ── 4. LLM (Groq cloud — also uses zero local RAM) ───────────────────────
-    # Local alternative — uncomment to run fully offline via Ollama:
-    # from langchain_community.chat_models import ChatOllama
-    # llm = ChatOllama(model="phi", temperature=0.3)
-    llm = ChatGroq(
-        model="llama-3.1-8b-instant",
-        temperature=0.3,
-        api_key=os.getenv("GROQ_API_KEY")
-    )
+    llm = _load_llm()
 
     # ── 5. Prompt ─────────────────────────────────────────────────────────────
     prompt = PromptTemplate(
@@ -56,7 +499,9 @@ def create_chatbot_engine(full_text):
             You are a helpful assistant.
             Answer ONLY using the provided transcript context.
             If the context does not contain the answer, say "I don't know."
-
+            When context passages start with a [m:ss] timestamp, cite the
+            timestamp of the passage your answer comes from.
+            {history}
             Context:
             {context}
 
@@ -65,17 +510,328 @@ def create_chatbot_engine(full_text):
 
             Answer:
             """,
-        input_variables=["context", "question"]
+        input_variables=["context", "question", "history"]
     )
 
-    # ── 6. Chain ─────────────────────────────────────────────────────────────
+    # ── 6. Conversation (follow-ups → standalone retrieval query) ──────────
+    conversational, history_budget = conversation_config_from_env()
+    rewriter = QueryRewriter(llm, history_budget) if conversational else None
+
+    def prepare(inputs, query):
+        question, history = split_input(inputs)
+        window = format_history(history, history_budget) if conversational else ""
+        return {
+            'question': question,
+            'query': query,
+            'history': f"\nConversation so far:\n{window}\n" if window else "",
+        }
+
+    def condense(inputs):
+        question, history = split_input(inputs)
+        query = rewriter.rewrite(question, history) if rewriter else question
+        return prepare(inputs, query)
+
+    async def acondense(inputs):
+        question, history = split_input(inputs)
+        query = await rewriter.arewrite(question, history) if rewriter else question
+        return prepare(inputs, query)
+
+    # ── 7. Chain ─────────────────────────────────────────────────────────────
+    token_budget = token_budget_from_env()
+
     def format_docs(retrieved_docs):
-        return "\n\n".join(doc.page_content for doc in retrieved_docs)
+        # Overlapping / adjacent chunks are merged and the result packed to
+        # the token budget, so the LLM never sees the same span twice.
+        return "\n\n".join(
+            f"[{format_timestamp(doc.metadata['start'])}] {doc.page_content}"
+            if "start" in doc.metadata else doc.page_content
+            for doc in pack_context(retrieved_docs, token_budget)
+        )
+
+    def retrieve(inputs):
+        with metrics.trace("query.retrieve") as span:
+            docs = retriever.invoke(inputs['query'])
+            span["docs"] = len(docs)
+        return docs
 
-    parallel_chain = RunnableParallel({
-        'context': retriever | RunnableLambda(format_docs),
-        'question': RunnablePassthrough()
-    })
+    async def aretrieve(inputs):
+        with metrics.trace("query.retrieve") as span:
+            docs = await retriever.ainvoke(inputs['query'])
+            span["docs"] = len(docs)
+        return docs
 
     parser = StrOutputParser()
-    return parallel_chain | prompt | llm | parser
+    answer_chain = prompt | llm | parser
+    answer_cache = _load_answer_cache()
+    embeddings = vector_store.embeddings
+
+    def lookup(inputs):
+        """
+        Returns (cached answer or None, query vector). Same video + same
+        standalone question + same retrieved chunks → same answer, so the
+        LLM call is skipped. The query vector is an LRU hit by now.
+        """
+        if answer_cache is None:
+            return None, None
+        query = inputs['query']
+        query_vector = embeddings.embed_query(query) if answer_cache.similarity_threshold else None
+        return check_cache(inputs, query_vector), query_vector
+
+    async def alookup(inputs):
+        # Same as lookup(), without blocking the event loop on the embedding
+        if answer_cache is None:
+            return None, None
+        query = inputs['query']
+        query_vector = (
+            await embeddings.aembed_query(query) if answer_cache.similarity_threshold else None
+        )
+        return check_cache(inputs, query_vector), query_vector
+
+    def check_cache(inputs, query_vector):
+        cached = answer_cache.get(video_id, inputs['query'], inputs['docs'], query_vector)
+        metrics.inc("answer_cache.hit" if cached is not None else "answer_cache.miss")
+        return cached
+
+    def remember(inputs, query_vector, response):
+        if answer_cache is not None:
+            answer_cache.put(video_id, inputs['query'], inputs['docs'], response, query_vector)
+
+    def render_context(inputs, format_context):
+        with metrics.trace("query.context") as span:
+            context = format_context(inputs['docs'])
+            span["prompt_tokens"] = sum(
+                count_tokens(text) for text in (context, inputs['question'], inputs['history'])
+            )
+        return {'context': context, 'question': inputs['question'], 'history': inputs['history']}
+
+    # Generators so the chain supports .stream()/.astream() token by token;
+    # .invoke() still returns the concatenated string.
+    def make_answer(chain, format_context):
+        def answer(inputs):
+            cached, query_vector = lookup(inputs)
+            if cached is not None:
+                yield cached
+                return
+            parts = []
+            chain_inputs = render_context(inputs, format_context)
+            timer = _LLMTimer()
+            try:
+                for token in chain.stream(chain_inputs):
+                    timer.token(token)
+                    parts.append(token)
+                    yield token
+            finally:
+                timer.finish()
+            remember(inputs, query_vector, "".join(parts))
+
+        async def aanswer(inputs):
+            cached, query_vector = await alookup(inputs)
+            if cached is not None:
+                yield cached
+                return
+            parts = []
+            chain_inputs = render_context(inputs, format_context)
+            timer = _LLMTimer()
+            try:
+                async for token in chain.astream(chain_inputs):
+                    timer.token(token)
+                    parts.append(token)
+                    yield token
+            finally:
+                timer.finish()
+            remember(inputs, query_vector, "".join(parts))
+
+        return RunnableLambda(answer, afunc=aanswer)
+
+    # Input is a question string or {"question", "history"}
+    rag_chain = (
+        RunnableLambda(condense, afunc=acondense)
+        | RunnablePassthrough.assign(docs=RunnableLambda(retrieve, afunc=aretrieve))
+        | make_answer(answer_chain, format_docs)
+    )
+
+    # ── 8. Whole-video summaries (map-reduce, built once per index) ──────────
+    summarizer = _create_summarizer(transcript, video_id, vector_store, llm, chunks)
+    if summarizer is None:
+        return rag_chain
+
+    summary_chain = (
+        RunnableLambda(lambda inputs: prepare(inputs, split_input(inputs)[0]))
+        | RunnablePassthrough.assign(docs=RunnableLambda(lambda _: summarizer.summary_docs()))
+        | make_answer(prompt | llm | parser, summarizer.format_context)
+    )
+
+    # Summary-style questions skip retrieval and answer from the
+    # precomputed section summaries in one LLM call.
+    def route(inputs):
+        question, _ = split_input(inputs)
+        return summary_chain if is_summary_query(question) else rag_chain
+
+    async def aroute(inputs):
+        return route(inputs)
+
+    return RunnableLambda(route, afunc=aroute)
+
+
+def create_shared_engine(transcript, video_id, report=None):
+    """
+    Builder for the engine registry: returns (engine, approx_bytes).
+
+    Long transcripts that are not cached are indexed progressively: the
+    engine is returned as soon as the first batch of chunks is searchable
+    and answers from the indexed part while the rest is embedded (see
+    indexing_coverage()).
+    """
+    report = report or (lambda stage, progress=None: None)
+    cache_key = _index_cache_key(transcript, video_id)
+    vector_store = _load_cached_store(cache_key, report)
+    if vector_store is None:
+        chunks = _chunk_transcript(transcript, video_id, report)
+        config = progressive_config_from_env()
+        if config is not None and len(chunks) >= config["min_chunks"]:
+            progressive = _start_progressive_index(chunks, cache_key, video_id, config, report)
+            report("Building engine", 0.9)
+            engine = create_chatbot_engine(
+                transcript,
+                video_id=video_id,
+                vector_store=progressive.vector_store,
+                retriever=_with_reranker(progressive.as_retriever(k=_retrieval_k())),
+                chunks=chunks,
+            )
+            return engine, _engine_size(progressive.estimated_bytes())
+        vector_store = _embed_chunks(chunks, cache_key, video_id, report)
+
+    report("Building engine", 0.9)
+    engine = create_chatbot_engine(transcript, video_id=video_id, vector_store=vector_store)
+    return engine, _engine_size(vector_store_bytes(vector_store))
+
+
+def _engine_size(size_bytes):
+    metrics.observe("engine.bytes", size_bytes)
+    return size_bytes
+
+
+def ingest_video(video_id, report=None):
+    """
+    Fetches, indexes and registers one video's engine in the shared
+    registry. Used as the ingestion-queue job.
+
+    Returns (engine_handle, transcript_note).
+    """
+    report = report or (lambda stage, progress=None: None)
+    registry = get_registry()
+
+    handle = registry.get(video_id)
+    if handle is not None:
+        return handle, None
+
+    report("Fetching transcript", 0.1)
+    segments, err = get_transcript_segments(video_id)
+    if not segments:
+        raise RuntimeError(err or "No transcript available.")
+
+    handle = registry.acquire(
+        video_id, lambda: create_shared_engine(segments, video_id, report=report)
+    )
+    return handle, err
+
+
+def ingest_collection(key, report=None):
+    """
+    Lists, indexes and registers a playlist ("playlist:<id>") or channel
+    ("channel:<id or @handle>") as one collection engine in the shared
+    registry. Used as the collection-queue job.
+
+    Returns (engine_handle, video_ids).
+
+    Optional env var:
+        RECALL_PLAYLIST_MAX_VIDEOS  — videos loaded per playlist or channel (default 25)
+    """
+    report = report or (lambda stage, progress=None: None)
+    kind, source = key.split(":", 1)
+    max_videos = int(os.getenv("RECALL_PLAYLIST_MAX_VIDEOS", 25))
+
+    report("Listing videos", 0.05)
+    if kind == "channel":
+        video_ids, err = get_channel_upload_ids(source, max_results=max_videos)
+    else:
+        video_ids, err = get_playlist_video_ids(source, max_results=max_videos)
+    if err:
+        raise RuntimeError(err)
+
+    def build():
+        collection = create_collection()
+        errors = collection.add_videos(
+            video_ids,
+            on_progress=lambda done, total, _: report(
+                f"Indexed {done} of {total} videos", 0.05 + 0.9 * done / total
+            ),
+        )
+        if not len(collection):
+            raise RuntimeError(next(iter(errors.values()), "No transcripts available."))
+        return create_shared_collection_engine(collection)
+
+    return get_registry().acquire(key, build), video_ids
+
+
+def create_collection(max_workers=4):
+    """
+    Empty VideoCollection wired to this module's embeddings, per-video
+    index cache and transcript fetcher.
+    """
+    return VideoCollection(
+        _load_embeddings(),
+        build_vector_store,
+        get_transcript_segments,
+        max_workers=max_workers,
+    )
+
+
+def create_collection_engine(collection, video_ids=None):
+    """
+    Engine answering across every video in `collection`, or only
+    `video_ids` when given. Rebuild it after adding or removing videos.
+    """
+    retriever = None
+    if video_ids:
+        k = _retrieval_k()
+        retriever = _with_reranker(
+            collection.as_retriever(video_ids=video_ids, k=k, fetch_k=max(40, 4 * k))
+        )
+    return create_chatbot_engine(
+        None, vector_store=collection.vector_store, retriever=retriever
+    )
+
+
+def create_shared_collection_engine(collection):
+    """
+    Builder for the engine registry: returns (engine, approx_bytes).
+    """
+    engine = create_collection_engine(collection)
+    return engine, vector_store_bytes(collection.vector_store)
+
+
+def stream_answer(engine, question, timings=None, history=None):
+    """
+    Yields answer tokens from `engine` as they are generated. `history` is
+    the conversation so far as [{"role", "content"}, ...], used to resolve
+    follow-up questions.
+
+    If `timings` is a dict it is filled with `ttft` (seconds until the
+    first non-empty token) and `total` (seconds until the last token).
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    inputs = {"question": question, "history": history} if history else question
+    for token in engine.stream(inputs):
+        if first_token_at is None and token:
+            first_token_at = time.perf_counter()
+        yield token
+
+    if timings is not None:
+        end = time.perf_counter()
+        timings["ttft"] = (first_token_at or end) - start
+        timings["total"] = end - start
+
+
+metrics.record_span("startup.import", time.perf_counter() - _import_started)
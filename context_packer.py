@@ -0,0 +1,172 @@
+import os
+import threading
+
+from langchain_core.documents import Document
+
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_failed = False
+
+
+def count_tokens(text):
+    """
+    Token count with tiktoken's cl100k_base — close to Llama 3's 128k BPE
+    vocabulary. Falls back to a ~4 chars/token estimate when tiktoken or
+    its encoding file is unavailable, or when RECALL_TOKENIZER=estimate.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text, max_tokens):
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return encoding.decode(tokens[:max_tokens])
+
+
+def pack_context(docs, token_budget=1024, min_overlap=20, min_tail_tokens=48):
+    """
+    Turns retrieved chunks (best first) into a compact context.
+
+    1. Merges chunks that overlap or are adjacent in the transcript into a
+       single span — the 200-char splitter overlaps are sent once, and
+       neighbouring caption chunks read as one passage.
+    2. Drops chunks wholly contained in another.
+    3. Orders spans by the rank of their best member.
+    4. Adds spans until `token_budget` is reached; the last span is
+       truncated if at least `min_tail_tokens` still fit, else dropped.
+
+    Returns a list of Documents; merged spans keep the earliest start and
+    latest end timestamp.
+    """
+    spans = []            # [rank, text, metadata]
+    for rank, doc in enumerate(docs):
+        span = [rank, doc.page_content, dict(doc.metadata)]
+        merged = True
+        while merged:
+            merged = False
+            for other in spans:
+                combined = _merge(other, span, min_overlap)
+                if combined is not None:
+                    spans.remove(other)
+                    span = combined
+                    merged = True
+                    break
+        spans.append(span)
+
+    spans.sort(key=lambda s: s[0])
+
+    packed = []
+    used = 0
+    for _, text, metadata in spans:
+        tokens = count_tokens(text)
+        if used + tokens <= token_budget:
+            packed.append(Document(page_content=text, metadata=metadata))
+            used += tokens
+            continue
+        remaining = token_budget - used
+        if remaining >= min_tail_tokens:
+            packed.append(
+                Document(page_content=truncate_to_tokens(text, remaining), metadata=metadata)
+            )
+        break
+    return packed
+
+
+def token_budget_from_env():
+    """
+    Optional env var:
+        RECALL_CONTEXT_TOKEN_BUDGET  — max context tokens per prompt (default 1024)
+    """
+    return int(os.getenv("RECALL_CONTEXT_TOKEN_BUDGET", 1024))
+
+
+# ── Internal helpers ────────────────────────────────────────────────────────
+
+def _merge(a, b, min_overlap):
+    """
+    Returns the merged span of a and b, or None if they are unrelated.
+    """
+    rank = min(a[0], b[0])
+    a_text, b_text = a[1], b[1]
+    a_meta, b_meta = a[2], b[2]
+
+    # Collection chunks from different videos are never one passage, even
+    # when their timestamps overlap or their text repeats
+    if a_meta.get("video_id") != b_meta.get("video_id"):
+        return None
+
+    if b_text in a_text:
+        return [rank, a_text, a[2]]
+    if a_text in b_text:
+        return [rank, b_text, b[2]]
+
+    # Timed caption chunks: adjacent when one ends where the next starts
+    if "start" in a_meta and "start" in b_meta:
+        first, second = (a, b) if a_meta["start"] <= b_meta["start"] else (b, a)
+        if second[2]["start"] - first[2]["end"] <= 1.0:
+            return [rank, f"{first[1]} {second[1]}", _span_metadata(first[2], second[2])]
+        return None
+
+    # Character-split chunks: suffix of one equals prefix of the other
+    overlap = _overlap(a_text, b_text, min_overlap)
+    if overlap:
+        return [rank, a_text + b_text[overlap:], a[2]]
+    overlap = _overlap(b_text, a_text, min_overlap)
+    if overlap:
+        return [rank, b_text + a_text[overlap:], b[2]]
+    return None
+
+
+def _overlap(left, right, min_overlap):
+    """
+    Length of the longest suffix of `left` that is a prefix of `right`.
+    """
+    if len(right) < min_overlap:
+        return 0
+    probe = right[:min_overlap]
+    start = max(0, len(left) - len(right))
+    idx = left.find(probe, start)
+    while idx != -1:
+        length = len(left) - idx
+        if right.startswith(left[idx:]):
+            return length
+        idx = left.find(probe, idx + 1)
+    return 0
+
+
+def _span_metadata(first, second):
+    metadata = dict(first)
+    metadata["end"] = max(first.get("end", first["start"]), second.get("end", second["start"]))
+    return metadata
+
+
+def _get_encoding():
+    """
+    The cl100k_base encoding, or None for the estimate. Decided once per
+    process: a failed load (e.g. no network to fetch the BPE file) is not
+    retried.
+
+    Optional env var:
+        RECALL_TOKENIZER  — tiktoken (default) or estimate, which always uses
+                            the ~4 chars/token estimate (deterministic, offline)
+    """
+    global _encoding, _encoding_failed
+    if _encoding is not None or _encoding_failed:
+        return _encoding
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            if os.getenv("RECALL_TOKENIZER", "tiktoken").strip().lower() == "estimate":
+                _encoding_failed = True
+                return None
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                _encoding_failed = True
+    return _encoding
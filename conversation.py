@@ -0,0 +1,148 @@
+import os
+import re
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from context_packer import count_tokens, truncate_to_tokens
+from hybrid_retrieval import STOPWORDS, tokenize
+from metrics import metrics
+
+
+# Words and openers that only make sense against earlier turns
+_FOLLOW_UP = re.compile(
+    r"\b(he|she|they|him|her|them|his|hers|their|it|its|this|that|these|those|"
+    r"there|then|above|previous|earlier|again|also|else|same|"
+    r"before that|after that|more about|elaborate|explain further|go on)\b",
+    re.IGNORECASE,
+)
+_FOLLOW_UP_OPENER = re.compile(
+    r"^\s*(and|but|so|or|what about|how about|why not|then)\b", re.IGNORECASE
+)
+
+_CONDENSE_PROMPT = PromptTemplate(
+    template="""
+        Rewrite the follow-up question as one standalone question about the
+        video that can be understood without the conversation. Resolve
+        pronouns and references like "that" or "after that" using the
+        conversation (including any [m:ss] timestamps). Return only the
+        rewritten question.
+
+        Conversation:
+        {history}
+
+        Follow-up question:
+        {question}
+
+        Standalone question:
+        """,
+    input_variables=["history", "question"]
+)
+
+_MAX_MESSAGE_TOKENS = 200
+_MAX_QUERY_TOKENS = 96
+
+
+def split_input(inputs):
+    """
+    Engine input is either a question string or
+    {"question": str, "history": [{"role", "content"}, ...]}.
+    Returns (question, history).
+    """
+    if isinstance(inputs, str):
+        return inputs, []
+    return inputs["question"], list(inputs.get("history") or [])
+
+
+def is_standalone(question):
+    """
+    Cheap check for questions that need no rewrite: long enough to carry
+    their own subject, no pronouns or back-references, and not opening
+    with "and" / "what about".
+    """
+    tokens = tokenize(question)
+    content = [t for t in tokens if t not in STOPWORDS]
+    if len(tokens) <= 3 or len(content) < 2:
+        return False
+    return not (_FOLLOW_UP.search(question) or _FOLLOW_UP_OPENER.search(question))
+
+
+def format_history(messages, token_budget=512):
+    """
+    Most recent turns that fit in `token_budget`, oldest first, as
+    "User: ..." / "Assistant: ..." lines. Each message is capped so one
+    long answer cannot crowd out the rest of the window.
+    """
+    lines = []
+    used = 0
+    for message in reversed(messages):
+        content = truncate_to_tokens(message["content"].strip(), _MAX_MESSAGE_TOKENS)
+        speaker = "User" if message["role"] == "user" else "Assistant"
+        line = f"{speaker}: {content}"
+        cost = count_tokens(line)
+        if used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(reversed(lines))
+
+
+class QueryRewriter:
+    """
+    Turns a follow-up plus the conversation into a standalone retrieval
+    query. Self-contained questions (and first questions) skip the LLM
+    call entirely.
+    """
+
+    def __init__(self, llm, history_budget=512):
+        self.chain = _CONDENSE_PROMPT | llm | StrOutputParser()
+        self.history_budget = history_budget
+
+    def needs_rewrite(self, question, history):
+        return bool(history) and not is_standalone(question)
+
+    def rewrite(self, question, history):
+        if not self.needs_rewrite(question, history):
+            metrics.inc("query.rewrite.skipped")
+            return question
+        with metrics.trace("query.rewrite"):
+            rewritten = self.chain.invoke(self._inputs(question, history))
+        return self._clean(rewritten, question)
+
+    async def arewrite(self, question, history):
+        if not self.needs_rewrite(question, history):
+            metrics.inc("query.rewrite.skipped")
+            return question
+        with metrics.trace("query.rewrite"):
+            rewritten = await self.chain.ainvoke(self._inputs(question, history))
+        return self._clean(rewritten, question)
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _inputs(self, question, history):
+        return {
+            "history": format_history(history, self.history_budget),
+            "question": question,
+        }
+
+    @staticmethod
+    def _clean(rewritten, question):
+        lines = [line.strip() for line in rewritten.strip().splitlines() if line.strip()]
+        if not lines:
+            return question
+        query = lines[0].strip('"\'').strip()
+        return truncate_to_tokens(query, _MAX_QUERY_TOKENS) or question
+
+
+def conversation_config_from_env():
+    """
+    Returns (enabled, history_token_budget).
+
+    Optional env vars:
+        RECALL_CONVERSATIONAL        — 0 answers every question in isolation (default 1)
+        RECALL_HISTORY_TOKEN_BUDGET  — max history tokens in the prompt (default 512)
+    """
+    return (
+        os.getenv("RECALL_CONVERSATIONAL", "1") != "0",
+        int(os.getenv("RECALL_HISTORY_TOKEN_BUDGET", 512)),
+    )
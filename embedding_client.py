@@ -0,0 +1,260 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+
+BatchStat = namedtuple("BatchStat", ["batch_index", "size", "seconds", "attempts"])
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class EmbeddingRequestError(Exception):
+    """
+    Raised by InferenceEndpointEmbeddings for non-2xx responses, carrying
+    the status code and any Retry-After hint so the batcher can back off.
+    """
+
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class InferenceEndpointEmbeddings(Embeddings):
+    """
+    Minimal client for a feature-extraction endpoint (HF Inference API,
+    a dedicated Inference Endpoint or text-embeddings-inference).
+
+    POSTs {"inputs": [...]} and expects a list of vectors back. Used when
+    HF_EMBEDDINGS_URL points at an explicit endpoint, including a local
+    stand-in server for testing.
+    """
+
+    def __init__(self, url, api_token="", timeout=30.0):
+        import httpx
+
+        headers = {"Content-Type": "application/json"}
+        if api_token:
+            headers["Authorization"] = f"Bearer {api_token}"
+        self.url = url
+        self._headers = headers
+        self._timeout = timeout
+        # One pooled client shared by all batch workers
+        self._client = httpx.Client(headers=headers, timeout=timeout)
+        self._async_client = None
+
+    def embed_documents(self, texts):
+        texts = [text.replace("\n", " ") for text in texts]
+        return self._parse(self._client.post(self.url, json={"inputs": texts}))
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        texts = [text.replace("\n", " ") for text in texts]
+        response = await self._get_async_client().post(self.url, json={"inputs": texts})
+        return self._parse(response)
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    def _get_async_client(self):
+        # Created on first use so it binds to the serving event loop
+        if self._async_client is None:
+            import httpx
+
+            self._async_client = httpx.AsyncClient(headers=self._headers, timeout=self._timeout)
+        return self._async_client
+
+    @staticmethod
+    def _parse(response):
+        if response.status_code >= 400:
+            raise EmbeddingRequestError(
+                response.status_code,
+                response.text[:200],
+                retry_after=_parse_retry_after(response.headers.get("Retry-After")),
+            )
+        return response.json()
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Wraps any LangChain Embeddings and sends documents in fixed-size
+    batches over a bounded thread pool.
+
+    Transient failures (429, 5xx, timeouts) are retried with exponential
+    backoff and jitter. A 429 also pauses every worker until the server's
+    Retry-After (or the backoff delay) has passed, so one rate limit does
+    not turn into a burst of further 429s. Per-batch latency is kept in
+    `batch_stats` for the most recent runs.
+    """
+
+    def __init__(
+        self,
+        base,
+        batch_size=32,
+        max_workers=4,
+        max_retries=5,
+        backoff=1.0,
+        max_backoff=30.0,
+    ):
+        self.base = base
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.batch_stats = deque(maxlen=1000)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="embed"
+        )
+        self._cooldown_until = 0.0
+        self._cooldown_lock = threading.Lock()
+
+    # ── Embeddings interface ────────────────────────────────────────────────
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+
+        batches = [
+            texts[i:i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        if len(batches) == 1:
+            return self._embed_batch(0, batches[0])
+
+        futures = [
+            self._executor.submit(self._embed_batch, i, batch)
+            for i, batch in enumerate(batches)
+        ]
+        vectors = []
+        for future in futures:           # submission order == input order
+            vectors.extend(future.result())
+        return vectors
+
+    def embed_query(self, text):
+        return self._with_retry(lambda: self.base.embed_query(text))[0]
+
+    async def aembed_query(self, text):
+        # Queries are a single request, so no batching — just retries
+        attempt = 0
+        while True:
+            remaining = self._cooldown_until - time.monotonic()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            attempt += 1
+            try:
+                return await self.base.aembed_query(text)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _embed_batch(self, batch_index, batch):
+        start = time.perf_counter()
+        vectors, attempts = self._with_retry(lambda: self.base.embed_documents(batch))
+        self.batch_stats.append(
+            BatchStat(batch_index, len(batch), time.perf_counter() - start, attempts)
+        )
+        return vectors
+
+    def _with_retry(self, call):
+        """
+        Runs `call`, retrying transient failures. Returns (result, attempts).
+        """
+        attempt = 0
+        while True:
+            self._wait_for_cooldown()
+            attempt += 1
+            try:
+                return call(), attempt
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    def _retry_delay(self, exc, attempt):
+        """
+        Seconds to wait before retrying after `exc`, or None if it should
+        propagate. A 429 instead pauses every worker via the shared
+        cooldown and returns 0.
+        """
+        status = _status_code(exc)
+        if attempt > self.max_retries or not _is_retryable(exc, status):
+            return None
+
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        delay *= random.uniform(0.5, 1.0)
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        if status == 429:
+            self._set_cooldown(delay)
+            return 0.0
+        return delay
+
+    def _set_cooldown(self, delay):
+        with self._cooldown_lock:
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+
+    def _wait_for_cooldown(self):
+        remaining = self._cooldown_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+def batched_embeddings_from_env(base):
+    """
+    Wraps `base` in a BatchedEmbeddings configured from env vars.
+
+    Optional env vars:
+        RECALL_EMBED_BATCH_SIZE   — texts per request (default 32)
+        RECALL_EMBED_CONCURRENCY  — concurrent requests (default 4)
+        RECALL_EMBED_MAX_RETRIES  — retries per batch (default 5)
+    """
+    return BatchedEmbeddings(
+        base,
+        batch_size=int(os.getenv("RECALL_EMBED_BATCH_SIZE", 32)),
+        max_workers=int(os.getenv("RECALL_EMBED_CONCURRENCY", 4)),
+        max_retries=int(os.getenv("RECALL_EMBED_MAX_RETRIES", 5)),
+    )
+
+
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status
+
+
+def _is_retryable(exc, status):
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    # Connection resets / timeouts surface without a status code
+    name = type(exc).__name__.lower()
+    return (
+        isinstance(exc, (ConnectionError, TimeoutError))
+        or "timeout" in name
+        or "connect" in name
+    )
+
+
+def _parse_retry_after(value):
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
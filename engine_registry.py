@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+import weakref
+
+from metrics import metrics
+
+
+class EngineHandle:
+    """
+    A session's reference to a shared engine.
+
+    Holding the handle keeps the engine alive; `release()` (or the handle
+    being garbage-collected with its Streamlit session) drops the reference.
+    """
+
+    def __init__(self, registry, video_id, engine):
+        self.video_id = video_id
+        self.engine = engine
+        self._finalizer = weakref.finalize(self, registry._release, video_id)
+
+    def release(self):
+        self._finalizer()
+
+    @property
+    def released(self):
+        return not self._finalizer.alive
+
+
+class _Entry:
+    __slots__ = ("engine", "size_bytes", "refs", "last_used", "ready", "error")
+
+    def __init__(self):
+        self.engine = None
+        self.size_bytes = 0
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.ready = threading.Event()
+        self.error = None
+
+
+class EngineRegistry:
+    """
+    Process-wide map of video ID → engine, shared across sessions.
+
+    50 sessions on the same video share one read-only FAISS index and one
+    LLM client instead of holding 50 copies. Concurrent requests for a
+    video that is still being built wait for the first build rather than
+    starting their own.
+
+    Unreferenced engines are evicted after `idle_seconds`, and earlier
+    (least recently used first) whenever the total estimated size exceeds
+    `max_bytes`. Engines still held by a session are never evicted.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, idle_seconds=1800.0):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    # ── Public API ──────────────────────────────────────────────────────────
+
+    def get(self, video_id):
+        """
+        Returns a handle for an already-built engine, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None or not entry.ready.is_set() or entry.error:
+                return None
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+            return EngineHandle(self, video_id, entry.engine)
+
+    def acquire(self, video_id, build):
+        """
+        Returns a handle for `video_id`, calling `build()` only if no
+        engine exists yet. `build` must return (engine, size_bytes).
+        """
+        self.evict()
+        with self._lock:
+            entry = self._entries.get(video_id)
+            owner = entry is None
+            if owner:
+                entry = self._entries[video_id] = _Entry()
+            entry.refs += 1
+
+        if owner:
+            try:
+                entry.engine, entry.size_bytes = build()
+            except BaseException as e:
+                with self._lock:
+                    entry.error = e
+                    self._entries.pop(video_id, None)
+                entry.ready.set()
+                raise
+            entry.ready.set()
+            self.evict()
+        else:
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+
+        with self._lock:
+            entry.last_used = time.monotonic()
+        return EngineHandle(self, video_id, entry.engine)
+
+    def evict(self):
+        """
+        Drops idle engines, then LRU unreferenced engines while over the
+        memory ceiling. Returns the evicted video IDs.
+        """
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for video_id, entry in list(self._entries.items()):
+                if self._evictable(entry) and now - entry.last_used > self.idle_seconds:
+                    del self._entries[video_id]
+                    evicted.append(video_id)
+
+            total = sum(e.size_bytes for e in self._entries.values())
+            candidates = sorted(
+                (item for item in self._entries.items() if self._evictable(item[1])),
+                key=lambda item: item[1].last_used,
+            )
+            for video_id, entry in candidates:
+                if total <= self.max_bytes:
+                    break
+                del self._entries[video_id]
+                total -= entry.size_bytes
+                evicted.append(video_id)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "engines": len(self._entries),
+                "total_bytes": sum(e.size_bytes for e in self._entries.values()),
+                "refs": {vid: e.refs for vid, e in self._entries.items()},
+            }
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    @staticmethod
+    def _evictable(entry):
+        return entry.refs <= 0 and entry.ready.is_set()
+
+    def _release(self, video_id):
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is not None:
+                entry.refs = max(0, entry.refs - 1)
+                entry.last_used = time.monotonic()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Returns the process-wide EngineRegistry, created on first use.
+
+    Optional env vars:
+        RECALL_ENGINE_MEMORY_MB     — ceiling for resident engines (default 256)
+        RECALL_ENGINE_IDLE_SECONDS  — evict unreferenced engines after (default 1800)
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = EngineRegistry(
+                max_bytes=int(float(os.getenv("RECALL_ENGINE_MEMORY_MB", 256)) * 1024 * 1024),
+                idle_seconds=float(os.getenv("RECALL_ENGINE_IDLE_SECONDS", 1800)),
+            )
+            registry = _registry
+            metrics.register_collector(lambda: {
+                "registry.engines": registry.stats()["engines"],
+                "registry.bytes": registry.stats()["total_bytes"],
+            })
+        return _registry
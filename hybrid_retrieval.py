@@ -0,0 +1,197 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from lean_store import LeanVectorStore
+
+
+_TOKEN = re.compile(r"\w+")
+
+# Small list — BM25's idf already discounts common words; this only keeps
+# filler out of the "does the top chunk contain every query term" check.
+STOPWORDS = frozenset("""
+a an and are as at be by did do does for from had has have he her him his how
+i in is it its me my of on or our she so that the their them they this to
+was we were what when where which who why will with you your
+""".split())
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 over a fixed list of texts.
+
+    Built as an inverted index (term → [(doc_idx, term_freq)]) so a query
+    only touches the postings of its own terms.
+    """
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+
+        for doc_idx, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((doc_idx, tf))
+
+        self.num_docs = len(self.doc_lengths)
+        self.avg_length = (sum(self.doc_lengths) / self.num_docs) if self.num_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (self.num_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    def search(self, query, k=10):
+        """
+        Returns up to k (doc_idx, score) pairs, best first.
+        """
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_idx, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_idx] / self.avg_length)
+                scores[doc_idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def contains_all(self, doc_idx, terms):
+        return all(
+            any(idx == doc_idx for idx, _ in self.postings.get(term, ()))
+            for term in terms
+        )
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses several ranked lists of ids: score(id) = Σ 1 / (k + rank).
+    Returns ids ordered by fused score.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    BM25 + FAISS retrieval fused with reciprocal rank fusion.
+
+    Both retrievers over-fetch `fetch_k` candidates and RRF picks the top
+    `k`. Exact names, numbers and jargon that embeddings blur are caught
+    by BM25, so good context fits in a smaller k.
+
+    Lexical-heavy queries (a quoted phrase, a number, or a rare term, with
+    every content word found in the best BM25 chunk) are answered from
+    BM25 alone, without calling the embedding endpoint at all.
+    """
+
+    vector_store: object
+    bm25: BM25Index
+    doc_ids: list
+    documents: object       # list of Documents, or a lean store's SlimDocstore
+    k: int = 6
+    fetch_k: int = 20
+    rrf_k: int = 60
+    lexical_shortcut: bool = True
+    rare_term_idf: float = 2.0
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @classmethod
+    def from_vector_store(cls, vector_store, search_store=None, **kwargs):
+        """
+        Builds the BM25 side from `vector_store`'s chunks. Similarity
+        searches go to `search_store` — a view over the same index, such
+        as a BatchedSearchStore — or to `vector_store` itself.
+        """
+        if isinstance(vector_store, LeanVectorStore):
+            # Documents are built from the slim docstore on access
+            doc_ids, documents = vector_store.ids(), vector_store.docstore
+            texts = (documents.text(i) for i in range(len(documents)))
+        else:
+            doc_ids = [vector_store.index_to_docstore_id[i] for i in range(vector_store.index.ntotal)]
+            documents = [vector_store.docstore.search(doc_id) for doc_id in doc_ids]
+            texts = (doc.page_content for doc in documents)
+        bm25 = BM25Index(texts)
+        return cls(
+            vector_store=search_store if search_store is not None else vector_store,
+            bm25=bm25,
+            doc_ids=doc_ids,
+            documents=documents,
+            **kwargs,
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        lexical = self.bm25.search(query, k=self.fetch_k)
+
+        if self.lexical_shortcut and self._is_lexical(query, lexical):
+            return [self._doc(idx) for idx, _ in lexical[:self.k]]
+
+        vector_docs = self.vector_store.similarity_search(query, k=self.fetch_k)
+        return self._fuse(vector_docs, lexical)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        lexical = self.bm25.search(query, k=self.fetch_k)
+
+        if self.lexical_shortcut and self._is_lexical(query, lexical):
+            return [self._doc(idx) for idx, _ in lexical[:self.k]]
+
+        # Async embedding call; the FAISS search itself runs in an executor
+        vector_docs = await self.vector_store.asimilarity_search(query, k=self.fetch_k)
+        return self._fuse(vector_docs, lexical)
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _fuse(self, vector_docs, lexical):
+        by_id = {doc.id: doc for doc in vector_docs}
+        fused = reciprocal_rank_fusion(
+            [
+                [doc.id for doc in vector_docs],
+                [self.doc_ids[idx] for idx, _ in lexical],
+            ],
+            k=self.rrf_k,
+        )
+        id_to_idx = {self.doc_ids[idx]: idx for idx, _ in lexical}
+        return [
+            by_id[doc_id] if doc_id in by_id else self._doc(id_to_idx[doc_id])
+            for doc_id in fused[:self.k]
+        ]
+
+    def _doc(self, idx):
+        doc = self.documents[idx]
+        if doc.id is None:
+            doc = Document(id=self.doc_ids[idx], page_content=doc.page_content, metadata=doc.metadata)
+        return doc
+
+    def _is_lexical(self, query, lexical):
+        if not lexical:
+            return False
+        terms = [t for t in tokenize(query) if t not in STOPWORDS]
+        if not terms or len(terms) > 4:
+            return False
+        if not self.bm25.contains_all(lexical[0][0], terms):
+            return False
+        return (
+            '"' in query
+            or any(any(c.isdigit() for c in t) for t in terms)
+            or any(self.bm25.idf.get(t, 0.0) >= self.rare_term_idf for t in terms)
+        )
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from lean_store import VECTORS_FILE as _LEAN_VECTORS_FILE, LeanVectorStore
+
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "indexes")
+DEFAULT_MAX_MB = 256
+
+_INDEX_FILE = "index.faiss"
+_DOCSTORE_FILE = "index.pkl"
+_META_FILE = "meta.json"
+
+
+def make_cache_key(video_id, full_text, model_name, splitter_params):
+    """
+    Content-addressed key for a built index.
+
+    Any change to the transcript, the embedding model or the splitter
+    settings yields a new key, so a stale index is never served.
+    """
+    transcript_hash = hashlib.sha256(full_text.encode("utf-8")).hexdigest()
+    payload = json.dumps(
+        {
+            "video_id": video_id,
+            "transcript": transcript_hash,
+            "model": model_name,
+            "splitter": splitter_params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class IndexCache:
+    """
+    On-disk store of FAISS indexes + docstores, bounded by total size.
+
+    Each entry is a directory holding the raw FAISS index, the pickled
+    docstore and a small meta file. Entries are written to a temp directory
+    and renamed into place, so a crash mid-write never leaves a half entry.
+    The directory mtime doubles as the LRU clock: hits touch it, eviction
+    removes the oldest entries until the cache fits within max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # ── Public API ──────────────────────────────────────────────────────────
+
+    def load(self, key, embeddings):
+        """
+        Returns a FAISS vector store for `key`, or None on a miss.
+
+        The index file is memory-mapped read-only where FAISS supports it,
+        so a hit costs a file open rather than a full read into RAM. Lean
+        entries come back as a LeanVectorStore with memory-mapped vectors.
+        """
+        entry = self.cache_dir / key
+        if (entry / _LEAN_VECTORS_FILE).exists():
+            return self._load_lean(entry, embeddings)
+
+        import faiss
+        from langchain_community.vectorstores import FAISS
+
+        index_path = entry / _INDEX_FILE
+        docstore_path = entry / _DOCSTORE_FILE
+        if not index_path.exists() or not docstore_path.exists():
+            return None
+
+        try:
+            try:
+                index = faiss.read_index(
+                    str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                )
+            except RuntimeError:
+                # Index types without mmap support are read normally
+                index = faiss.read_index(str(index_path))
+
+            with open(docstore_path, "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+        except Exception:
+            # Corrupt or incompatible entry — drop it and rebuild
+            self._remove(entry)
+            return None
+
+        self._touch(entry)
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+    def save(self, key, vector_store, meta=None):
+        """
+        Persists `vector_store` under `key`, then evicts old entries.
+        """
+        entry = self.cache_dir / key
+        tmp = self.cache_dir / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if tmp.exists():
+            shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        try:
+            if isinstance(vector_store, LeanVectorStore):
+                vector_store.save(str(tmp))
+            else:
+                import faiss
+
+                faiss.write_index(vector_store.index, str(tmp / _INDEX_FILE))
+                with open(tmp / _DOCSTORE_FILE, "wb") as f:
+                    pickle.dump(
+                        (vector_store.docstore, vector_store.index_to_docstore_id), f
+                    )
+            with open(tmp / _META_FILE, "w") as f:
+                json.dump({"created": time.time(), **(meta or {})}, f)
+
+            with self._lock:
+                if entry.exists():
+                    # Another session built the same index first — keep theirs
+                    shutil.rmtree(tmp, ignore_errors=True)
+                else:
+                    os.replace(tmp, entry)
+                self._evict()
+        finally:
+            if tmp.exists():
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def load_json(self, key, name):
+        """
+        Reads a JSON sidecar (e.g. precomputed summaries) stored alongside
+        the index under `key`, or None.
+        """
+        path = self.cache_dir / key / f"{name}.json"
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_json(self, key, name, data):
+        """
+        Stores a JSON sidecar next to an existing index entry. Does nothing
+        if the entry has been evicted.
+        """
+        entry = self.cache_dir / key
+        if not entry.is_dir():
+            return
+        tmp = entry / f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, entry / f"{name}.json")
+        except OSError:
+            pass   # entry evicted mid-write
+
+    def size_bytes(self):
+        return sum(size for _, _, size in self._entries())
+
+    def clear(self):
+        with self._lock:
+            for entry, _, _ in self._entries():
+                self._remove(entry)
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _load_lean(self, entry, embeddings):
+        try:
+            vector_store = LeanVectorStore.load(str(entry), embeddings)
+        except Exception:
+            self._remove(entry)
+            return None
+        self._touch(entry)
+        return vector_store
+
+    def _entries(self):
+        """
+        Yields (path, last_used, size_bytes) for every committed entry.
+        """
+        if not self.cache_dir.exists():
+            return []
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            try:
+                size = sum(p.stat().st_size for p in entry.iterdir())
+                entries.append((entry, entry.stat().st_mtime, size))
+            except FileNotFoundError:
+                continue   # evicted concurrently
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        # Never evict the most recent entry, even if it alone exceeds the limit
+        while total > self.max_bytes and len(entries) > 1:
+            entry, _, size = entries.pop(0)
+            self._remove(entry)
+            total -= size
+
+    @staticmethod
+    def _touch(entry):
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(entry):
+        shutil.rmtree(entry, ignore_errors=True)
+
+
+def index_cache_from_env():
+    """
+    Builds an IndexCache from env vars, or returns None when disabled.
+
+    Optional env vars:
+        RECALL_INDEX_CACHE_DIR     — cache directory (default .cache/indexes)
+        RECALL_INDEX_CACHE_MAX_MB  — size bound in MB, 0 disables the cache
+    """
+    max_mb = float(os.getenv("RECALL_INDEX_CACHE_MAX_MB", DEFAULT_MAX_MB))
+    if max_mb <= 0:
+        return None
+    return IndexCache(
+        cache_dir=os.getenv("RECALL_INDEX_CACHE_DIR", DEFAULT_CACHE_DIR),
+        max_bytes=int(max_mb * 1024 * 1024),
+    )
@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class IngestionJob:
+    """
+    State of one video's ingestion, updated by the worker and polled by
+    the UI. `result` / `note` hold whatever the runner returned.
+    """
+
+    def __init__(self, video_id):
+        self.video_id = video_id
+        self.status = QUEUED
+        self.stage = "Queued"
+        self.progress = 0.0
+        self.result = None
+        self.note = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def report(self, stage, progress=None):
+        self.stage = stage
+        if progress is not None:
+            self.progress = max(self.progress, min(1.0, progress))
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class IngestionQueue:
+    """
+    Thread pool that ingests videos in the background.
+
+    Submitting a video that is already queued, running or recently done
+    returns the existing job instead of starting another, so a burst of
+    sessions on the same video indexes it once. `run(video_id, report)`
+    does the work and returns (result, note); `report(stage, progress)`
+    updates the job for pollers.
+
+    Finished jobs are kept for `keep_seconds` so late pollers still see
+    the outcome; a failed job can be resubmitted right away. Expiry also
+    runs on a timer, so a job's result is released (`on_expire`) even
+    when nothing is submitted or polled afterwards.
+    """
+
+    def __init__(self, run, max_workers=2, keep_seconds=600.0, on_expire=None):
+        self.run = run
+        self.keep_seconds = keep_seconds
+        self.on_expire = on_expire
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="ingest"
+        )
+
+    def submit(self, video_id):
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(video_id)
+            if job is not None and job.status != FAILED:
+                return job
+            job = self._jobs[video_id] = IngestionJob(video_id)
+        self._executor.submit(self._work, job)
+        return job
+
+    def get(self, video_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(video_id)
+
+    def jobs(self):
+        with self._lock:
+            self._expire()
+            return list(self._jobs.values())
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _work(self, job):
+        job.status = RUNNING
+        job.report("Starting", 0.0)
+        # finished_at is set before the final status so _expire never sees
+        # a finished job without it
+        try:
+            job.result, job.note = self.run(job.video_id, job.report)
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            job.stage = "Failed"
+            job.finished_at = time.time()
+            job.status = FAILED
+        else:
+            job.report("Ready", 1.0)
+            job.finished_at = time.time()
+            job.status = DONE
+        finally:
+            if job.finished_at is None:     # BaseException out of run()
+                job.finished_at = time.time()
+            job._done.set()
+            timer = threading.Timer(self.keep_seconds + 0.01, self._expire_now)
+            timer.daemon = True
+            timer.start()
+
+    def _expire_now(self):
+        with self._lock:
+            self._expire()
+
+    def _expire(self):
+        now = time.time()
+        for video_id, job in list(self._jobs.items()):
+            if job.finished_at is None or not job.finished:
+                continue
+            if now - job.finished_at > self.keep_seconds:
+                del self._jobs[video_id]
+                if self.on_expire and job.result is not None:
+                    self.on_expire(job.result)
+
+
+_queues = {}
+_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue():
+    """
+    Returns the process-wide IngestionQueue, created on first use.
+
+    Jobs run chatbot_engine.ingest_video, which leaves the finished engine
+    in the shared engine registry; the job keeps its handle until the job
+    expires so the engine is not evicted before the UI picks it up.
+
+    Optional env var:
+        RECALL_INGEST_WORKERS  — concurrent ingestion jobs (default 2)
+    """
+    from chatbot_engine import ingest_video
+
+    return _shared_queue("videos", ingest_video, int(os.getenv("RECALL_INGEST_WORKERS", 2)))
+
+
+def get_collection_queue():
+    """
+    Returns the process-wide IngestionQueue for playlists and channels,
+    keyed "playlist:<id>" / "channel:<id>". Jobs run
+    chatbot_engine.ingest_collection and hold the collection engine's
+    handle the same way. A separate queue, so a 25-video collection does
+    not occupy the workers single videos wait on.
+
+    Optional env var:
+        RECALL_COLLECTION_WORKERS  — concurrent collection jobs (default 1)
+    """
+    from chatbot_engine import ingest_collection
+
+    return _shared_queue(
+        "collections", ingest_collection, int(os.getenv("RECALL_COLLECTION_WORKERS", 1))
+    )
+
+
+def _shared_queue(name, run, max_workers):
+    with _queue_lock:
+        if name not in _queues:
+            _queues[name] = IngestionQueue(
+                run, max_workers=max_workers, on_expire=lambda handle: handle.release()
+            )
+        return _queues[name]
@@ -0,0 +1,387 @@
+import math
+import os
+import pickle
+from collections.abc import Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+CHUNKS_FILE = "chunks.pkl"
+
+# Rows upcast to float32 per step of a search — bounds the temporary copy
+_SEARCH_BLOCK = 4096
+# Leading characters of a chunk used to find where it overlaps the previous one
+_OVERLAP_PROBE = 64
+# Smallest row capacity allocated when an array first has to grow
+_MIN_CAPACITY = 64
+
+
+class SlimDocstore(Sequence):
+    """
+    Chunk texts in one contiguous UTF-8 buffer with a (start, end) byte
+    offset per chunk, and metadata stored column by column.
+
+    Replaces a dict of full Document objects: no per-chunk object
+    overhead, numeric metadata (start/end times) packed into float
+    arrays, and text that overlapping chunks repeat (the character
+    splitter's 200-character overlap) stored once. Documents are built
+    on access, so only the handful a query returns ever exist.
+
+    Appending is amortised O(batch): the buffer is a bytearray and the
+    offset and numeric columns grow geometrically, so a progressive
+    build's many small appends never recopy what is already stored.
+    """
+
+    def __init__(self, buffer=b"", offsets=None, columns=None):
+        self.buffer = bytearray(buffer)
+        self.offsets = offsets if offsets is not None else np.zeros((0, 2), dtype=np.int64)
+        self.columns = columns or {}
+        self._size = len(self.offsets)
+        self._tail = None       # (text, start) of the chunk that ends the buffer
+
+    # ── Public API ──────────────────────────────────────────────────────────
+
+    def append(self, texts, metadatas=None):
+        metadatas = metadatas or [{} for _ in texts]
+        n, added = len(self), len(texts)
+        offsets = []
+        for text in texts:
+            start, extra = self._place(text, len(self.buffer))
+            self.buffer += extra
+            offsets.append((start, start + len(text.encode("utf-8"))))
+        self.offsets = _grow(self.offsets, n + added)
+        self.offsets[n:n + added] = np.array(offsets, dtype=np.int64).reshape(-1, 2)
+
+        keys = set(self.columns) | {key for metadata in metadatas for key in metadata}
+        for key in keys:
+            values = [metadata.get(key) for metadata in metadatas]
+            self.columns[key] = _extend_column(self.columns.get(key), n, values)
+        self._size = n + added
+
+    def text(self, i):
+        start, end = self.offsets[i]
+        return self.buffer[start:end].decode("utf-8")
+
+    def metadata(self, i):
+        metadata = {}
+        for key, column in self.columns.items():
+            value = column[i]
+            if isinstance(column, np.ndarray):
+                if math.isnan(value):
+                    continue
+                value = float(value)
+            elif value is None:
+                continue
+            metadata[key] = value
+        return metadata
+
+    def search(self, doc_id):
+        """
+        Docstore-style lookup by ID (the chunk's row number as a string).
+        """
+        return self[int(doc_id)]
+
+    @property
+    def nbytes(self):
+        """
+        Allocated size, including spare capacity for further appends.
+        """
+        column_bytes = sum(_column_bytes(column, len(column)) for column in self.columns.values())
+        return len(self.buffer) + self.offsets.nbytes + column_bytes
+
+    @property
+    def used_nbytes(self):
+        """
+        Size of the stored rows alone, without spare capacity.
+        """
+        n = len(self)
+        column_bytes = sum(_column_bytes(column, n) for column in self.columns.values())
+        return len(self.buffer) + n * self.offsets.itemsize * 2 + column_bytes
+
+    def compact(self):
+        """
+        Drops the spare capacity left by appends.
+        """
+        n = len(self)
+        self.offsets = self.offsets[:n].copy()
+        for key, column in self.columns.items():
+            if isinstance(column, np.ndarray):
+                self.columns[key] = column[:n].copy()
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return Document(id=str(i), page_content=self.text(i), metadata=self.metadata(i))
+
+    def __getstate__(self):
+        n = len(self)
+        columns = {
+            key: column[:n] if isinstance(column, np.ndarray) else column
+            for key, column in self.columns.items()
+        }
+        return {"buffer": bytes(self.buffer), "offsets": self.offsets[:n], "columns": columns}
+
+    def __setstate__(self, state):
+        self.__init__(state["buffer"], state["offsets"], state["columns"])
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _place(self, text, size):
+        """
+        Returns (start offset, bytes to append) for `text`, reusing the
+        tail of the previous chunk when `text` starts with it.
+        """
+        if self._tail is not None:
+            prev, prev_start = self._tail
+            probe = text[:_OVERLAP_PROBE]
+            idx = prev.find(probe) if probe else -1
+            while idx != -1:
+                shared = prev[idx:]
+                if text.startswith(shared) or shared.startswith(text):
+                    start = prev_start + len(prev[:idx].encode("utf-8"))
+                    extra = text[len(shared):].encode("utf-8")
+                    if extra:
+                        self._tail = (text, start)
+                    return start, extra
+                idx = prev.find(probe, idx + 1)
+        self._tail = (text, size)
+        return size, text.encode("utf-8")
+
+
+
+class LeanVectorStore(VectorStore):
+    """
+    Exact L2 vector search over float16 vectors in a numpy array, with
+    chunks in a SlimDocstore — half the vector memory of the flat float32
+    FAISS index and no FAISS or langchain_community import at all.
+
+    Vectors are upcast to float32 a block at a time during a search, so
+    the float16 array (possibly memory-mapped from the index cache) is
+    never copied whole. Distances are squared L2, like IndexFlatL2.
+
+    Added vectors go into buffers that grow geometrically, so building
+    the store batch by batch (progressive indexing) stays linear overall;
+    compact() trims the spare capacity once the build is done.
+    """
+
+    def __init__(self, embeddings, vectors=None, docstore=None, sq_norms=None):
+        self._embeddings = embeddings
+        self.docstore = docstore if docstore is not None else SlimDocstore()
+        self._vectors = vectors if vectors is not None else np.zeros((0, 0), dtype=np.float16)
+        self._size = len(self._vectors)
+        self._norms = sq_norms if sq_norms is not None else _sq_norms(self._vectors)
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    @property
+    def vectors(self):
+        return self._vectors[:self._size]
+
+    # ── Building ────────────────────────────────────────────────────────────
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        store = cls(embedding)
+        store.add_texts(texts, metadatas)
+        return store
+
+    @classmethod
+    def from_embeddings(cls, text_embeddings, embedding, metadatas=None, **kwargs):
+        store = cls(embedding)
+        store.add_embeddings(text_embeddings, metadatas)
+        return store
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(
+            zip(texts, self._embeddings.embed_documents(texts)), metadatas
+        )
+
+    def add_embeddings(self, text_embeddings, metadatas=None, **kwargs):
+        pairs = list(text_embeddings)
+        if not pairs:
+            return []
+        texts, vectors = zip(*pairs)
+        first = len(self.docstore)
+        block = np.asarray(vectors, dtype=np.float32).astype(np.float16)
+        self.docstore.append(list(texts), list(metadatas) if metadatas else None)
+
+        n, added = self._size, len(block)
+        if n == 0:
+            self._vectors = np.zeros((0, block.shape[1]), dtype=np.float16)
+            self._norms = np.zeros(0, dtype=np.float32)
+        self._vectors = _grow(self._vectors, n + added)
+        self._norms = _grow(self._norms, n + added)
+        self._vectors[n:n + added] = block
+        self._norms[n:n + added] = _sq_norms(block)
+        self._size = n + added
+        return [str(i) for i in range(first, len(self.docstore))]
+
+    def compact(self):
+        """
+        Drops the spare capacity left by incremental adds.
+        """
+        if len(self._vectors) > self._size:
+            self._vectors = self._vectors[:self._size].copy()
+            self._norms = self._norms[:self._size].copy()
+        self.docstore.compact()
+
+    # ── Search ──────────────────────────────────────────────────────────────
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector(self._embeddings.embed_query(query), k=k)
+
+    async def asimilarity_search(self, query, k=4, **kwargs):
+        vector = await self._embeddings.aembed_query(query)
+        return self.similarity_search_by_vector(vector, k=k)
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embeddings.embed_query(query), k=k)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k)]
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vectors([embedding], k=k)[0]
+
+    def similarity_search_by_vectors(self, embeddings, k=4):
+        """
+        Top-k Documents for each of several query vectors, in one pass
+        over the stored vectors.
+        """
+        return [
+            [doc for doc, _ in hits]
+            for hits in self.similarity_search_with_score_by_vectors(embeddings, k=k)
+        ]
+
+    def similarity_search_with_score_by_vectors(self, embeddings, k=4):
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        n = self._size
+        if n == 0:
+            return [[] for _ in range(len(queries))]
+        dots = np.empty((n, len(queries)), dtype=np.float32)
+        for start in range(0, n, _SEARCH_BLOCK):
+            block = self._vectors[start:min(n, start + _SEARCH_BLOCK)].astype(np.float32)
+            dots[start:start + len(block)] = block @ queries.T
+        distances = self._norms[:n, None] - 2 * dots + np.einsum("ij,ij->i", queries, queries)
+
+        k = min(k, n)
+        results = []
+        for column in distances.T:
+            top = np.argpartition(column, k - 1)[:k]
+            top = top[np.argsort(column[top])]
+            results.append([(self.docstore[int(i)], float(column[i])) for i in top])
+        return results
+
+    # ── Introspection and persistence ───────────────────────────────────────
+
+    def ids(self):
+        return [str(i) for i in range(len(self.docstore))]
+
+    @property
+    def dim(self):
+        return self._vectors.shape[1] if self._vectors.ndim == 2 else 0
+
+    @property
+    def nbytes(self):
+        return self._vectors.nbytes + self._norms.nbytes + self.docstore.nbytes
+
+    @property
+    def used_nbytes(self):
+        """
+        Size of the stored rows alone — what the store shrinks to after
+        compact().
+        """
+        row_bytes = self.dim * self._vectors.itemsize + self._norms.itemsize
+        return self._size * row_bytes + self.docstore.used_nbytes
+
+    def save(self, directory):
+        np.save(os.path.join(directory, VECTORS_FILE), self.vectors)
+        np.save(os.path.join(directory, NORMS_FILE), self._norms[:self._size])
+        with open(os.path.join(directory, CHUNKS_FILE), "wb") as f:
+            pickle.dump(self.docstore, f)
+
+    @classmethod
+    def load(cls, directory, embeddings):
+        """
+        Reads a saved store; the vectors are memory-mapped read-only.
+        Entries saved without their norms get them recomputed a block at
+        a time.
+        """
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        norms_path = os.path.join(directory, NORMS_FILE)
+        sq_norms = np.load(norms_path) if os.path.exists(norms_path) else None
+        with open(os.path.join(directory, CHUNKS_FILE), "rb") as f:
+            docstore = pickle.load(f)
+        return cls(embeddings, vectors=vectors, docstore=docstore, sq_norms=sq_norms)
+
+
+def _sq_norms(vectors):
+    """
+    Squared L2 norm of each row, upcasting one block of rows at a time.
+    """
+    norms = np.zeros(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors) if vectors.size else 0, _SEARCH_BLOCK):
+        block = vectors[start:start + _SEARCH_BLOCK].astype(np.float32)
+        norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+    return norms
+
+
+def _column_bytes(column, rows):
+    if isinstance(column, np.ndarray):
+        return rows * column.itemsize
+    return 8 * rows + sum(len(v) for v in set(column) if isinstance(v, str))
+
+
+def _grow(array, rows):
+    """
+    `array`, or a copy with capacity doubled, holding at least `rows` rows.
+    """
+    if len(array) >= rows:
+        return array
+    grown = np.empty((max(rows, 2 * len(array), _MIN_CAPACITY),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _extend_column(column, n, values):
+    """
+    Appends `values` to a metadata column holding `n` rows (None if the
+    key is new). Numeric values go into a float64 array (NaN where
+    missing) while every value is numeric; anything else is a list, with
+    repeated strings (video IDs) shared.
+    """
+    numeric = all(
+        v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values
+    )
+    if column is None:
+        column = np.full(n, math.nan) if numeric else [None] * n
+    if isinstance(column, np.ndarray):
+        if numeric:
+            column = _grow(column, n + len(values))
+            column[n:n + len(values)] = [math.nan if v is None else v for v in values]
+            return column
+        column = [None if math.isnan(v) else v for v in column[:n].tolist()]
+    interned = {}
+    column.extend(interned.setdefault(v, v) if isinstance(v, str) else v for v in values)
+    return column
+
+
+def lean_engine_from_env():
+    """
+    Optional env var:
+        RECALL_LEAN_ENGINE  — 1 stores each video's chunks in a SlimDocstore
+                              and its vectors as float16 numpy (default 0)
+    """
+    return os.getenv("RECALL_LEAN_ENGINE", "0") != "0"
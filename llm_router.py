@@ -0,0 +1,742 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from metrics import metrics
+
+
+_ROLES = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+
+
+class OpenAICompatibleChat(BaseChatModel):
+    """
+    Chat model for any server speaking the OpenAI chat-completions API:
+    Ollama (/v1), vLLM, llama.cpp server, LM Studio, or a local fake in
+    tests. Streams via server-sent events over one pooled httpx client,
+    plus one httpx.AsyncClient per event loop for the async path.
+    """
+
+    base_url: str
+    model: str
+    api_key: str = ""
+    temperature: float = 0.3
+    timeout: float = 60.0
+
+    _client: Any = PrivateAttr(default=None)
+    _aclients: Any = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+
+    @property
+    def _llm_type(self) -> str:
+        return "openai-compatible"
+
+    @property
+    def health_url(self):
+        return f"{self.base_url.rstrip('/')}/models"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        response = self._http().post(
+            "/chat/completions", json=self._payload(messages, stop, stream=False)
+        )
+        response.raise_for_status()
+        content = response.json()["choices"][0]["message"].get("content") or ""
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        with self._http().stream(
+            "POST", "/chat/completions", json=self._payload(messages, stop, stream=True)
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                text = _sse_text(line)
+                if text is None:
+                    break
+                if text:
+                    if run_manager:
+                        run_manager.on_llm_new_token(text)
+                    yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        response = await self._ahttp().post(
+            "/chat/completions", json=self._payload(messages, stop, stream=False)
+        )
+        response.raise_for_status()
+        content = response.json()["choices"][0]["message"].get("content") or ""
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async with self._ahttp().stream(
+            "POST", "/chat/completions", json=self._payload(messages, stop, stream=True)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                text = _sse_text(line)
+                if text is None:
+                    break
+                if text:
+                    if run_manager:
+                        await run_manager.on_llm_new_token(text)
+                    yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.Client(
+                base_url=self.base_url.rstrip("/"), headers=headers, timeout=self.timeout
+            )
+        return self._client
+
+    def _ahttp(self):
+        """
+        AsyncClient for the running event loop — an httpx connection pool
+        cannot be shared across loops.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            import httpx
+
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            client = self._aclients[loop] = httpx.AsyncClient(
+                base_url=self.base_url.rstrip("/"), headers=headers, timeout=self.timeout
+            )
+        return client
+
+    def _payload(self, messages, stop, stream):
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": _ROLES.get(m.type, "user"), "content": m.content} for m in messages
+            ],
+            "temperature": self.temperature,
+            "stream": stream,
+        }
+        if stop:
+            payload["stop"] = stop
+        return payload
+
+
+class Backend:
+    """
+    One LLM behind the router: a chat model plus its concurrency limit
+    and health state. After a failure the backend is skipped for a
+    cooldown that doubles with each consecutive failure (up to
+    `max_cooldown`), then tried again.
+    """
+
+    def __init__(self, name, model, max_concurrency=8, health_url=None,
+                 cooldown=5.0, max_cooldown=120.0):
+        self.name = name
+        self.model = model
+        self.health_url = health_url
+        self.max_concurrency = max(1, max_concurrency)
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.in_flight = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def acquire(self, timeout=None):
+        if timeout == 0:
+            acquired = self._slots.acquire(blocking=False)
+        else:
+            acquired = self._slots.acquire(timeout=timeout)
+        if acquired:
+            with self._lock:
+                self.in_flight += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def mark_ok(self):
+        with self._lock:
+            self.failures = 0
+            self.down_until = 0.0
+
+    def mark_failed(self):
+        with self._lock:
+            self.failures += 1
+            delay = min(self.max_cooldown, self.cooldown * 2 ** (self.failures - 1))
+            self.down_until = time.monotonic() + delay
+
+
+class _Flight:
+    """
+    Output of one in-flight generation, replayable by any number of
+    identical requests that arrive while it is running.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+        self._waiters = []            # (loop, future) of async followers
+
+    def push(self, text):
+        with self._cond:
+            self.chunks.append(text)
+            self._notify()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._notify()
+
+    def follow(self):
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self.chunks) and not self.done:
+                    self._cond.wait()
+                if i < len(self.chunks):
+                    text = self.chunks[i]
+                    i += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield text
+
+    async def afollow(self):
+        """
+        follow() for async callers; the leader may be on any thread or loop.
+        """
+        i = 0
+        while True:
+            waiter = None
+            with self._cond:
+                if i < len(self.chunks):
+                    text = self.chunks[i]
+                    i += 1
+                elif self.error is not None:
+                    raise self.error
+                elif self.done:
+                    return
+                else:
+                    loop = asyncio.get_running_loop()
+                    waiter = loop.create_future()
+                    self._waiters.append((loop, waiter))
+            if waiter is not None:
+                await waiter
+                continue
+            yield text
+
+    def _notify(self):
+        self._cond.notify_all()
+        for loop, waiter in self._waiters:
+            loop.call_soon_threadsafe(_resolve, waiter)
+        self._waiters.clear()
+
+
+class LLMRouter(BaseChatModel):
+    """
+    Chat model that spreads requests over several backends in priority
+    order, so one provider's outage or rate limit does not take the app
+    down.
+
+    - Failover: a backend that errors, or produces no first token within
+      `timeout` seconds, is put in cooldown and the next one is tried. Once
+      tokens have been streamed the answer is committed to that backend.
+    - Concurrency: each backend has its own slot limit; a full backend is
+      skipped in favour of the next, and only if all are full does the
+      request wait for a slot.
+    - Coalescing: identical requests already in flight share one
+      generation instead of each paying for its own.
+    - Health: backends with a health URL can be probed periodically via
+      `check_health()` so a dead local server is skipped before a user
+      request has to time out on it.
+    """
+
+    backends: list
+    timeout: float = 20.0
+
+    _inflight: dict = PrivateAttr(default_factory=dict)
+    _inflight_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self) -> str:
+        return "recall-router"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        content = "".join(chunk.message.content for chunk in self._stream(messages, stop, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        key = _request_key(messages, stop)
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            metrics.inc("llm.coalesced")
+            source = flight.follow()
+        else:
+            source = self._lead(key, flight, messages, stop)
+
+        for text in source:
+            if run_manager:
+                run_manager.on_llm_new_token(text)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        content = "".join(
+            [chunk.message.content async for chunk in self._astream(messages, stop, **kwargs)]
+        )
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        key = _request_key(messages, stop)
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            metrics.inc("llm.coalesced")
+            source = flight.afollow()
+        else:
+            source = self._alead(key, flight, messages, stop)
+
+        async for text in source:
+            if run_manager:
+                await run_manager.on_llm_new_token(text)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    def check_health(self, timeout=2.0):
+        """
+        Probes every backend that has a health URL; unreachable ones go
+        into cooldown, reachable ones are cleared.
+        """
+        import httpx
+
+        for backend in self.backends:
+            if not backend.health_url:
+                continue
+            try:
+                ok = httpx.get(backend.health_url, timeout=timeout).status_code < 500
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                backend.mark_ok()
+            elif backend.healthy:
+                backend.mark_failed()
+
+    def gauges(self):
+        gauges = {}
+        for backend in self.backends:
+            gauges[f"llm.{backend.name}.healthy"] = int(backend.healthy)
+            gauges[f"llm.{backend.name}.in_flight"] = backend.in_flight
+        return gauges
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _lead(self, key, flight, messages, stop):
+        error = None
+        try:
+            for text in self._route(messages, stop):
+                flight.push(text)
+                yield text
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else RuntimeError("Generation was abandoned.")
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            flight.finish(error)
+
+    async def _alead(self, key, flight, messages, stop):
+        error = None
+        try:
+            async for text in self._aroute(messages, stop):
+                flight.push(text)
+                yield text
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else RuntimeError("Generation was abandoned.")
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            flight.finish(error)
+
+    def _route(self, messages, stop):
+        healthy = [b for b in self.backends if b.healthy]
+        # Backends in cooldown are a last resort, not excluded outright
+        ordered = healthy + [b for b in self.backends if not b.healthy]
+
+        errors = []
+        busy = []
+        for backend in ordered:
+            if not backend.acquire(timeout=0):
+                busy.append(backend)
+                continue
+            outcome = yield from self._try(backend, messages, stop, errors)
+            if outcome:
+                return
+        for backend in busy:
+            if not backend.acquire(timeout=self.timeout):
+                errors.append(f"{backend.name}: no free slot")
+                continue
+            outcome = yield from self._try(backend, messages, stop, errors)
+            if outcome:
+                return
+        raise RuntimeError("All LLM backends failed: " + "; ".join(errors))
+
+    def _try(self, backend, messages, stop, errors):
+        """
+        Streams from `backend` (whose slot is already held). Returns True
+        on success, False to fail over; re-raises if the failure happens
+        after tokens were already sent.
+        """
+        started = False
+        with metrics.trace(f"llm.{backend.name}") as span:
+            try:
+                for text in _stream_with_timeout(backend, messages, stop, self.timeout):
+                    started = True
+                    yield text
+            except Exception as e:
+                backend.mark_failed()
+                span["failed"] = 1
+                metrics.inc(
+                    f"llm.{backend.name}.timeout" if isinstance(e, TimeoutError)
+                    else f"llm.{backend.name}.error"
+                )
+                if started:
+                    raise
+                errors.append(f"{backend.name}: {type(e).__name__}: {e}")
+                return False
+        backend.mark_ok()
+        return True
+
+    async def _aroute(self, messages, stop):
+        """
+        _route() for async callers: same order, failover and slot rules.
+        Only waiting for a slot on a full backend occupies a thread.
+        """
+        healthy = [b for b in self.backends if b.healthy]
+        ordered = healthy + [b for b in self.backends if not b.healthy]
+
+        errors = []
+        busy = []
+        for backend in ordered:
+            if not backend.acquire(timeout=0):
+                busy.append(backend)
+                continue
+            failures = len(errors)
+            async for text in self._atry(backend, messages, stop, errors):
+                yield text
+            if len(errors) == failures:
+                return
+        for backend in busy:
+            if not await _acquire_async(backend, self.timeout):
+                errors.append(f"{backend.name}: no free slot")
+                continue
+            failures = len(errors)
+            async for text in self._atry(backend, messages, stop, errors):
+                yield text
+            if len(errors) == failures:
+                return
+        raise RuntimeError("All LLM backends failed: " + "; ".join(errors))
+
+    async def _atry(self, backend, messages, stop, errors):
+        """
+        _try() for async callers. An async generator cannot return a
+        value, so a failover is signalled by appending to `errors`.
+        """
+        started = False
+        with metrics.trace(f"llm.{backend.name}") as span:
+            try:
+                async for text in _astream_with_timeout(backend, messages, stop, self.timeout):
+                    started = True
+                    yield text
+            except Exception as e:
+                backend.mark_failed()
+                span["failed"] = 1
+                metrics.inc(
+                    f"llm.{backend.name}.timeout" if isinstance(e, TimeoutError)
+                    else f"llm.{backend.name}.error"
+                )
+                if started:
+                    raise
+                errors.append(f"{backend.name}: {type(e).__name__}: {e}")
+                return
+        backend.mark_ok()
+
+
+def _stream_with_timeout(backend, messages, stop, timeout):
+    """
+    Streams text from backend.model on a worker thread, raising
+    TimeoutError if no chunk arrives within `timeout` seconds. The worker
+    holds the backend's slot until the model call really ends, so a hung
+    backend stays at its concurrency limit and is skipped.
+    """
+    chunks = queue.Queue()
+
+    def pump():
+        try:
+            for chunk in backend.model.stream(messages, stop=stop):
+                if chunk.content:
+                    chunks.put(("chunk", chunk.content))
+            chunks.put(("done", None))
+        except Exception as e:
+            chunks.put(("error", e))
+        finally:
+            backend.release()
+
+    threading.Thread(target=pump, daemon=True, name=f"llm-{backend.name}").start()
+    while True:
+        try:
+            kind, value = chunks.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no response within {timeout:g}s") from None
+        if kind == "chunk":
+            yield value
+        elif kind == "error":
+            raise value
+        else:
+            return
+
+
+# Pump tasks of _astream_with_timeout, referenced until they finish
+_pump_tasks = set()
+
+
+async def _astream_with_timeout(backend, messages, stop, timeout):
+    """
+    _stream_with_timeout() on the event loop: the model's native async
+    stream runs as a task that holds the backend's slot until the call
+    really ends, and TimeoutError is raised if no chunk arrives within
+    `timeout` seconds.
+    """
+    chunks = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for chunk in backend.model.astream(messages, stop=stop):
+                if chunk.content:
+                    chunks.put_nowait(("chunk", chunk.content))
+            chunks.put_nowait(("done", None))
+        except Exception as e:
+            chunks.put_nowait(("error", e))
+        finally:
+            backend.release()
+
+    task = asyncio.create_task(pump())
+    _pump_tasks.add(task)
+    task.add_done_callback(_pump_tasks.discard)
+    while True:
+        try:
+            kind, value = await asyncio.wait_for(chunks.get(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"no response within {timeout:g}s") from None
+        if kind == "chunk":
+            yield value
+        elif kind == "error":
+            raise value
+        else:
+            return
+
+
+async def _acquire_async(backend, timeout):
+    """
+    backend.acquire(timeout) on a worker thread. If the caller is
+    cancelled while waiting (e.g. a client disconnects), a slot the
+    thread acquires anyway is released instead of leaking.
+    """
+    acquiring = asyncio.ensure_future(asyncio.to_thread(backend.acquire, timeout))
+    try:
+        return await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        def release_if_acquired(future):
+            if not future.cancelled() and future.exception() is None and future.result():
+                backend.release()
+
+        acquiring.add_done_callback(release_if_acquired)
+        raise
+
+
+def _sse_text(line):
+    """
+    Text delta of one server-sent-events line: "" for lines without
+    text, None at the end-of-stream marker.
+    """
+    if not line.startswith("data:"):
+        return ""
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return None
+    choices = json.loads(data).get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or ""
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _request_key(messages, stop):
+    return json.dumps(
+        [[m.type, m.content] for m in messages] + [stop or []], sort_keys=True, default=str
+    )
+
+
+def _groq_backend(concurrency, timeout):
+    from langchain_groq import ChatGroq
+
+    model = ChatGroq(
+        model=os.getenv("RECALL_GROQ_MODEL", "llama-3.1-8b-instant"),
+        temperature=0.3,
+        api_key=os.getenv("GROQ_API_KEY"),
+        max_retries=0,              # the router fails over instead
+        timeout=timeout,
+    )
+    return Backend("groq", model, max_concurrency=concurrency)
+
+
+def _openai_backend(name, base_url, model_name, api_key, concurrency, timeout):
+    model = OpenAICompatibleChat(
+        base_url=base_url, model=model_name, api_key=api_key, timeout=timeout
+    )
+    return Backend(name, model, max_concurrency=concurrency, health_url=model.health_url)
+
+
+def llm_router_from_env():
+    """
+    Builds an LLMRouter from env vars and starts its health checker.
+
+    Optional env vars:
+        RECALL_LLM_BACKENDS         — comma-separated priority order of
+                                      groq, ollama, openai (default groq)
+        RECALL_LLM_TIMEOUT          — seconds to first token before failover (default 20)
+        RECALL_LLM_CONCURRENCY      — concurrent requests per backend (default 8)
+        RECALL_LLM_HEALTH_INTERVAL  — seconds between health probes, 0 disables (default 30)
+        RECALL_GROQ_MODEL           — default llama-3.1-8b-instant
+        RECALL_OLLAMA_URL           — default http://localhost:11434/v1
+        RECALL_OLLAMA_MODEL         — default phi
+        RECALL_OPENAI_BASE_URL      — any OpenAI-compatible server, e.g. http://localhost:8080/v1
+        RECALL_OPENAI_MODEL         — model name sent to that server
+        RECALL_OPENAI_API_KEY       — bearer token, if the server needs one
+    """
+    names = [n.strip().lower() for n in os.getenv("RECALL_LLM_BACKENDS", "groq").split(",") if n.strip()]
+    timeout = float(os.getenv("RECALL_LLM_TIMEOUT", 20))
+    concurrency = int(os.getenv("RECALL_LLM_CONCURRENCY", 8))
+
+    backends = []
+    for name in names:
+        if name == "groq":
+            backends.append(_groq_backend(concurrency, timeout))
+        elif name == "ollama":
+            backends.append(_openai_backend(
+                "ollama",
+                os.getenv("RECALL_OLLAMA_URL", "http://localhost:11434/v1"),
+                os.getenv("RECALL_OLLAMA_MODEL", "phi"),
+                "",
+                concurrency,
+                timeout,
+            ))
+        elif name == "openai":
+            base_url = os.getenv("RECALL_OPENAI_BASE_URL", "")
+            if not base_url:
+                raise ValueError("RECALL_OPENAI_BASE_URL is required for the 'openai' LLM backend.")
+            backends.append(_openai_backend(
+                "openai",
+                base_url,
+                os.getenv("RECALL_OPENAI_MODEL", "default"),
+                os.getenv("RECALL_OPENAI_API_KEY", ""),
+                concurrency,
+                timeout,
+            ))
+        else:
+            raise ValueError(
+                f"Unknown LLM backend '{name}' in RECALL_LLM_BACKENDS. "
+                "Choose from: groq, ollama, openai."
+            )
+    if not backends:
+        raise ValueError("RECALL_LLM_BACKENDS lists no backends.")
+
+    router = LLMRouter(backends=backends, timeout=timeout)
+    metrics.register_collector(router.gauges)
+
+    interval = float(os.getenv("RECALL_LLM_HEALTH_INTERVAL", 30))
+    if interval > 0 and any(b.health_url for b in backends):
+        def probe():
+            while True:
+                router.check_health()
+                time.sleep(interval)
+
+        threading.Thread(target=probe, daemon=True, name="llm-health").start()
+    return router
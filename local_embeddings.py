@@ -0,0 +1,141 @@
+import os
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+
+# ONNX exports shipped in the sentence-transformers/all-MiniLM-L6-v2 repo
+ONNX_FP32_FILE = "onnx/model.onnx"
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+MAX_SEQ_LENGTH = 256   # all-MiniLM-L6-v2 was trained with 256 word pieces
+
+
+class LocalOnnxEmbeddings(Embeddings):
+    """
+    Runs all-MiniLM-L6-v2 on the local CPU through onnxruntime — no torch,
+    no network on the query path once the model files are cached.
+
+    The model is loaded lazily on first use, so importing this module or
+    constructing the backend costs nothing. Texts are embedded in batches
+    of at most `batch_size` (sorted by length to minimise padding), which
+    bounds peak activation memory regardless of transcript length.
+
+    Mean pooling + L2 normalisation reproduce sentence-transformers output,
+    so vectors are interchangeable with the HF Inference API backend.
+
+    Requires: onnxruntime, tokenizers, huggingface_hub
+    """
+
+    def __init__(
+        self,
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        quantized=False,
+        batch_size=32,
+        num_threads=None,
+        onnx_file=None,
+    ):
+        self.model_name = model_name
+        self.onnx_file = onnx_file or (ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)
+        self.batch_size = max(1, batch_size)
+        self.num_threads = num_threads
+        self._session = None
+        self._tokenizer = None
+        self._input_names = ()
+        self._load_lock = threading.Lock()
+
+    # ── Embeddings interface ────────────────────────────────────────────────
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        self._ensure_loaded()
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            batch_vectors = self._embed_batch([texts[i] for i in idx])
+            for i, vector in zip(idx, batch_vectors):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _ensure_loaded(self):
+        if self._session is not None:
+            return
+        with self._load_lock:
+            if self._session is not None:
+                return
+
+            import onnxruntime as ort
+            from huggingface_hub import hf_hub_download
+            from tokenizers import Tokenizer
+
+            model_path = hf_hub_download(self.model_name, self.onnx_file)
+            tokenizer_path = hf_hub_download(self.model_name, "tokenizer.json")
+
+            tokenizer = Tokenizer.from_file(tokenizer_path)
+            tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+            tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+            options = ort.SessionOptions()
+            if self.num_threads:
+                options.intra_op_num_threads = self.num_threads
+                options.inter_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+            session = ort.InferenceSession(
+                model_path, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+
+            self._tokenizer = tokenizer
+            self._input_names = {i.name for i in session.get_inputs()}
+            self._session = session
+
+    def _embed_batch(self, texts):
+        import numpy as np
+
+        encodings = self._tokenizer.encode_batch(
+            [text.replace("\n", " ") for text in texts]
+        )
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self._session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalise
+        mask = attention_mask[..., None].astype(token_embeddings.dtype)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled = summed / counts
+        norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return (pooled / norms).tolist()
+
+
+def local_embeddings_from_env(model_name, quantized):
+    """
+    Builds a LocalOnnxEmbeddings configured from env vars.
+
+    Optional env vars:
+        RECALL_LOCAL_EMBED_BATCH_SIZE  — texts per forward pass (default 32)
+        RECALL_LOCAL_EMBED_THREADS     — onnxruntime intra-op threads
+                                         (default: onnxruntime's choice)
+        RECALL_ONNX_FILE               — override the ONNX file in the repo
+    """
+    threads = os.getenv("RECALL_LOCAL_EMBED_THREADS", "")
+    return LocalOnnxEmbeddings(
+        model_name=model_name,
+        quantized=quantized,
+        batch_size=int(os.getenv("RECALL_LOCAL_EMBED_BATCH_SIZE", 32)),
+        num_threads=int(threads) if threads else None,
+        onnx_file=os.getenv("RECALL_ONNX_FILE") or None,
+    )
@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+class _Series:
+    """
+    Count / sum plus a bounded reservoir of recent observations for
+    quantiles.
+    """
+
+    __slots__ = ("count", "total", "recent")
+
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """
+    In-process pipeline metrics.
+
+    - timings:  stage durations in seconds (`with metrics.trace("stage")`)
+    - values:   sizes per operation (chunk counts, prompt tokens)
+    - counters: event counts (cache hits, failures)
+
+    Every finished trace is also kept in a short in-memory ring for the
+    debug panel and, if `trace_log` is set, appended to a JSONL file.
+    Collectors registered with `register_collector` contribute extra
+    gauges (e.g. cache hit rates) at render time.
+    """
+
+    def __init__(self, window=1024, trace_log=None, recent_traces=200):
+        self.window = window
+        self.trace_log = trace_log
+        self._timings = defaultdict(lambda: _Series(self.window))
+        self._values = defaultdict(lambda: _Series(self.window))
+        self._counters = defaultdict(int)
+        self._recent = deque(maxlen=recent_traces)
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    # ── Recording ───────────────────────────────────────────────────────────
+
+    @contextmanager
+    def trace(self, stage, **attrs):
+        """
+        Times the enclosed block under `stage`. Yields a dict the block can
+        add attributes to (e.g. span["chunks"] = 42); numeric attributes
+        are also recorded as values named "<stage>.<attr>".
+        """
+        span = dict(attrs)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record_span(stage, time.perf_counter() - start, span, error)
+
+    def record_span(self, stage, seconds, attrs=None, error=None):
+        attrs = attrs or {}
+        with self._lock:
+            self._timings[stage].observe(seconds)
+            if error:
+                self._counters[f"{stage}.error"] += 1
+            for key, value in attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self._values[f"{stage}.{key}"].observe(value)
+            record = {"ts": time.time(), "stage": stage, "seconds": round(seconds, 6), **attrs}
+            if error:
+                record["error"] = error
+            self._recent.append(record)
+        self._write(record)
+
+    def observe(self, name, value):
+        with self._lock:
+            self._values[name].observe(value)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def register_collector(self, collector):
+        """
+        `collector()` returns {gauge_name: number}; called at render time.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    # ── Reading ─────────────────────────────────────────────────────────────
+
+    def snapshot(self):
+        with self._lock:
+            timings = {
+                stage: {
+                    "count": s.count,
+                    "sum": s.total,
+                    "mean": s.total / s.count if s.count else 0.0,
+                    "p50": s.quantile(0.5),
+                    "p95": s.quantile(0.95),
+                }
+                for stage, s in self._timings.items()
+            }
+            values = {
+                name: {
+                    "count": s.count,
+                    "sum": s.total,
+                    "mean": s.total / s.count if s.count else 0.0,
+                }
+                for name, s in self._values.items()
+            }
+            counters = dict(self._counters)
+            collectors = list(self._collectors)
+        return {
+            "timings": timings,
+            "values": values,
+            "counters": counters,
+            "gauges": self._collect(collectors),
+        }
+
+    def recent_traces(self, limit=50):
+        with self._lock:
+            return list(self._recent)[-limit:]
+
+    def render_prometheus(self):
+        """
+        Prometheus text exposition format.
+        """
+        snap = self.snapshot()
+        lines = [
+            "# HELP recall_stage_seconds Pipeline stage duration in seconds.",
+            "# TYPE recall_stage_seconds summary",
+        ]
+        for stage, t in sorted(snap["timings"].items()):
+            label = _label("stage", stage)
+            lines.append(f'recall_stage_seconds{{{label},quantile="0.5"}} {t["p50"]:.6f}')
+            lines.append(f'recall_stage_seconds{{{label},quantile="0.95"}} {t["p95"]:.6f}')
+            lines.append(f"recall_stage_seconds_sum{{{label}}} {t['sum']:.6f}")
+            lines.append(f"recall_stage_seconds_count{{{label}}} {t['count']}")
+
+        lines += [
+            "# HELP recall_value Per-operation sizes (chunks, tokens).",
+            "# TYPE recall_value summary",
+        ]
+        for name, v in sorted(snap["values"].items()):
+            label = _label("name", name)
+            lines.append(f"recall_value_sum{{{label}}} {v['sum']:g}")
+            lines.append(f"recall_value_count{{{label}}} {v['count']}")
+
+        lines += ["# HELP recall_events_total Event counters.", "# TYPE recall_events_total counter"]
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"recall_events_total{{{_label('name', name)}}} {value}")
+
+        lines += ["# HELP recall_gauge Point-in-time gauges.", "# TYPE recall_gauge gauge"]
+        for name, value in sorted(snap["gauges"].items()):
+            lines.append(f"recall_gauge{{{_label('name', name)}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    @staticmethod
+    def _collect(collectors):
+        gauges = {}
+        for collector in collectors:
+            try:
+                gauges.update(collector())
+            except Exception:
+                continue   # a broken collector must not break /metrics
+        return gauges
+
+    def _write(self, record):
+        if not self.trace_log:
+            return
+        line = json.dumps(record, default=str)
+        with self._log_lock:
+            try:
+                with open(self.trace_log, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError:
+                pass
+
+
+def _label(key, value):
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'{key}="{escaped}"'
+
+
+# Process-wide instance used by every module.
+metrics = Metrics(trace_log=os.getenv("RECALL_TRACE_LOG") or None)
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None):
+    """
+    Serves GET /metrics (Prometheus) on a daemon thread. Idempotent.
+
+    Optional env var:
+        RECALL_METRICS_PORT  — port to listen on; unset disables the server
+    """
+    global _server
+    port = port or os.getenv("RECALL_METRICS_PORT")
+    if not port:
+        return None
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _Handler)
+            except OSError:
+                return None   # already bound by another process (e.g. a second worker)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
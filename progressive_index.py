@@ -0,0 +1,211 @@
+import os
+import threading
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from lean_store import LeanVectorStore
+from metrics import metrics
+from vector_index import estimate_bytes
+
+
+class ProgressiveIndex:
+    """
+    Vector index that is searchable while it is still being built.
+
+    Chunks are embedded in transcript order on a background thread, a
+    small first batch and then larger ones, and each batch is added to
+    the index as soon as its vectors arrive. Queries run against whatever
+    has been indexed so far, so the first answer no longer waits for a
+    multi-hour transcript to be embedded end to end.
+
+    When every chunk is in, `finish(vector_store)` is called (compression,
+    caching) and must return the retriever to use from then on — e.g. the
+    full hybrid retriever. Until then, searches are vector-only over the
+    indexed prefix.
+
+    `store_class` is the vector store built up batch by batch — FAISS by
+    default, or anything with the same from_embeddings / add_embeddings
+    interface (LeanVectorStore).
+    """
+
+    def __init__(
+        self,
+        chunks,
+        embeddings,
+        first_batch=32,
+        batch_size=128,
+        finish=None,
+        store_class=None,
+    ):
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.first_batch = max(1, first_batch)
+        self.batch_size = max(1, batch_size)
+        self.finish = finish
+        self.store_class = store_class
+        self.vector_store = None
+        self.retriever = None
+        self.indexed = 0
+        self.error = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._done = threading.Event()
+
+    # ── Public API ──────────────────────────────────────────────────────────
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="progressive-index").start()
+        return self
+
+    def wait_ready(self, timeout=None):
+        """
+        Blocks until the first batch is searchable. Raises the build error
+        if indexing failed before anything could be searched.
+        """
+        self._ready.wait(timeout)
+        if self.vector_store is None and self.error is not None:
+            raise self.error
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def complete(self):
+        return self.retriever is not None
+
+    def coverage(self):
+        """
+        How much of the transcript is searchable: chunk counts, the
+        fraction indexed, and the end time (seconds) of the last indexed
+        chunk when chunks carry timestamps.
+        """
+        indexed, total = self.indexed, len(self.chunks)
+        until = self.chunks[indexed - 1].metadata.get("end") if indexed else None
+        return {
+            "indexed": indexed,
+            "total": total,
+            "fraction": indexed / total if total else 1.0,
+            "until": until,
+            "complete": self.complete,
+            "error": str(self.error) if self.error is not None else None,
+        }
+
+    def estimated_bytes(self):
+        """
+        Size of the finished flat index plus chunk text — what the engine
+        will weigh once indexing completes.
+        """
+        if isinstance(self.vector_store, LeanVectorStore):
+            # Lean stores know their exact size; scale the indexed rows up
+            # (not the spare capacity, which compact() drops at the end)
+            return int(self.vector_store.used_nbytes * len(self.chunks) / max(1, self.indexed))
+        dim = self.vector_store.index.d if self.vector_store is not None else 384
+        text_bytes = sum(len(chunk.page_content.encode("utf-8")) for chunk in self.chunks)
+        return estimate_bytes("flat", len(self.chunks), dim) + text_bytes
+
+    def search(self, vector, k):
+        with self._lock:
+            if self.vector_store is None:
+                return []
+            return self.vector_store.similarity_search_by_vector(vector, k=k)
+
+    def as_retriever(self, k=6):
+        return ProgressiveRetriever(index=self, k=k)
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _batches(self):
+        start, size = 0, self.first_batch
+        while start < len(self.chunks):
+            yield self.chunks[start:start + size]
+            start += size
+            size = self.batch_size
+
+    def _run(self):
+        try:
+            for batch in self._batches():
+                with metrics.trace("index.embed_batch", chunks=len(batch)):
+                    vectors = self.embeddings.embed_documents([c.page_content for c in batch])
+                self._add(batch, vectors)
+                self._ready.set()
+            if self.finish is not None:
+                retriever = self.finish(self.vector_store)
+                with self._lock:
+                    self.retriever = retriever
+        except Exception as e:
+            self.error = e
+            metrics.inc("index.progressive.failed")
+        finally:
+            self._ready.set()
+            self._done.set()
+
+    def _add(self, batch, vectors):
+        store_class = self.store_class
+        if store_class is None:
+            from langchain_community.vectorstores import FAISS
+
+            store_class = FAISS
+
+        pairs = list(zip([c.page_content for c in batch], vectors))
+        metadatas = [c.metadata for c in batch]
+        with self._lock:
+            if self.vector_store is None:
+                self.vector_store = store_class.from_embeddings(pairs, self.embeddings, metadatas=metadatas)
+            else:
+                self.vector_store.add_embeddings(pairs, metadatas=metadatas)
+            self.indexed += len(batch)
+
+
+class ProgressiveRetriever(BaseRetriever):
+    """
+    Vector search over a ProgressiveIndex's indexed prefix, switching to
+    the index's final retriever once the build completes.
+    """
+
+    index: ProgressiveIndex
+    k: int = 6
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        if self.index.retriever is not None:
+            return self.index.retriever.invoke(query)
+        vector = self.index.embeddings.embed_query(query)
+        return self.index.search(vector, self.k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        if self.index.retriever is not None:
+            return await self.index.retriever.ainvoke(query)
+        vector = await self.index.embeddings.aembed_query(query)
+        return self.index.search(vector, self.k)
+
+
+def progressive_config_from_env():
+    """
+    Returns None when progressive indexing is off, else a dict of settings.
+
+    Optional env vars:
+        RECALL_PROGRESSIVE             — 0 always embeds the whole transcript before
+                                         the first question (default 1)
+        RECALL_PROGRESSIVE_MIN_CHUNKS  — transcripts with fewer chunks are indexed
+                                         in one go (default 64, about an hour of speech)
+        RECALL_PROGRESSIVE_FIRST_BATCH — chunks indexed before questions open (default 32)
+        RECALL_PROGRESSIVE_BATCH       — chunks embedded per later step (default 128)
+    """
+    if os.getenv("RECALL_PROGRESSIVE", "1") == "0":
+        return None
+    return {
+        "min_chunks": int(os.getenv("RECALL_PROGRESSIVE_MIN_CHUNKS", 64)),
+        "first_batch": int(os.getenv("RECALL_PROGRESSIVE_FIRST_BATCH", 32)),
+        "batch_size": int(os.getenv("RECALL_PROGRESSIVE_BATCH", 128)),
+    }
@@ -0,0 +1,211 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_question(text):
+    """
+    Case-, punctuation- and whitespace-insensitive form of a question, so
+    "Summarize this video." and "summarize this video" share a cache entry.
+    """
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def chunk_set_key(docs):
+    """
+    Order-independent fingerprint of the retrieved chunks. Uses the
+    docstore id where available, else a hash of the chunk text.
+    """
+    ids = sorted(
+        getattr(doc, "id", None)
+        or hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+        for doc in docs
+    )
+    return hashlib.sha1("|".join(ids).encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    """
+    Thread-safe hit/miss counters.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings backend with an LRU over embed_query, so a repeated
+    question skips the embedding round-trip. Documents pass straight through.
+    """
+
+    def __init__(self, base, maxsize=2048):
+        self.base = base
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        key, vector = self._lookup(text)
+        if vector is None:
+            vector = self.base.embed_query(text)
+            self._store(key, vector)
+        return vector
+
+    async def aembed_documents(self, texts):
+        return await self.base.aembed_documents(texts)
+
+    async def aembed_query(self, text):
+        key, vector = self._lookup(text)
+        if vector is None:
+            vector = await self.base.aembed_query(text)
+            self._store(key, vector)
+        return vector
+
+    def _lookup(self, text):
+        key = normalize_question(text)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+        self.stats.record(vector is not None)
+        return key, vector
+
+    def _store(self, key, vector):
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+
+class AnswerCache:
+    """
+    TTL cache of LLM answers keyed by (video, normalized question,
+    retrieved-chunk set).
+
+    Including the chunk set means an answer is only reused when the model
+    would have seen exactly the same context. With `similarity_threshold`
+    set, a question that misses exactly can still hit an earlier one for
+    the same video and chunk set whose query embedding has cosine
+    similarity above the threshold ("what is this video about" vs
+    "what's the video about").
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600.0, similarity_threshold=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.stats = CacheStats()
+        # key -> (expires_at, answer, query_vector)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, video_id, question, docs, query_vector=None):
+        now = time.monotonic()
+        context_key = chunk_set_key(docs)
+        key = (video_id, normalize_question(question), context_key)
+
+        with self._lock:
+            answer = self._get_exact(key, now)
+            if answer is None and self.similarity_threshold and query_vector is not None:
+                answer = self._get_similar(video_id, context_key, query_vector, now)
+
+        self.stats.record(answer is not None)
+        return answer
+
+    def put(self, video_id, question, docs, answer, query_vector=None):
+        key = (video_id, normalize_question(question), chunk_set_key(docs))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, answer, query_vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _get_exact(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, answer, _ = entry
+        if expires_at < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def _get_similar(self, video_id, context_key, query_vector, now):
+        best_key, best_score = None, self.similarity_threshold
+        for key, (expires_at, _, vector) in self._entries.items():
+            if key[0] != video_id or key[2] != context_key:
+                continue
+            if vector is None or expires_at < now:
+                continue
+            score = _cosine(query_vector, vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key][1]
+
+
+def answer_cache_from_env():
+    """
+    Builds an AnswerCache from env vars, or returns None when disabled.
+
+    Optional env vars:
+        RECALL_ANSWER_CACHE_SIZE        — max cached answers, 0 disables (default 1024)
+        RECALL_ANSWER_CACHE_TTL         — seconds an answer stays valid (default 3600)
+        RECALL_ANSWER_CACHE_SIMILARITY  — cosine threshold for semantic hits,
+                                          e.g. 0.95 (default: exact match only)
+    """
+    maxsize = int(os.getenv("RECALL_ANSWER_CACHE_SIZE", 1024))
+    if maxsize <= 0:
+        return None
+    threshold = os.getenv("RECALL_ANSWER_CACHE_SIMILARITY", "")
+    return AnswerCache(
+        maxsize=maxsize,
+        ttl=float(os.getenv("RECALL_ANSWER_CACHE_TTL", 3600)),
+        similarity_threshold=float(threshold) if threshold else None,
+    )
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from metrics import metrics
+
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_ONNX_FILE = "onnx/model.onnx"
+MAX_PAIR_LENGTH = 320   # question + one ~1000-character chunk
+
+
+class RerankTimeout(Exception):
+    pass
+
+
+class OnnxCrossEncoder:
+    """
+    Small cross-encoder on the local CPU through onnxruntime. Scores
+    (query, passage) pairs jointly, which ranks far more precisely than
+    comparing two independently computed embeddings.
+
+    Loaded lazily on first use, like LocalOnnxEmbeddings. Scoring runs on
+    a small thread pool so callers can enforce a deadline; between
+    batches the worker checks the deadline and stops early once nobody
+    is waiting for the result.
+
+    Requires: onnxruntime, tokenizers, huggingface_hub
+    """
+
+    def __init__(
+        self,
+        model_name=DEFAULT_RERANK_MODEL,
+        batch_size=16,
+        num_threads=None,
+        onnx_file=RERANK_ONNX_FILE,
+        max_workers=2,
+    ):
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.num_threads = num_threads
+        self.onnx_file = onnx_file
+        self._session = None
+        self._tokenizer = None
+        self._input_names = ()
+        self._load_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="rerank"
+        )
+
+    def score(self, query, texts, deadline=None):
+        """
+        Relevance score per text (higher is better). Raises RerankTimeout
+        if `deadline` (time.monotonic()) passes before scoring finishes.
+        """
+        future = self._executor.submit(self._score, query, texts, deadline)
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise RerankTimeout() from None
+
+    async def ascore(self, query, texts, deadline=None):
+        future = asyncio.wrap_future(self._executor.submit(self._score, query, texts, deadline))
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise RerankTimeout() from None
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _score(self, query, texts, deadline):
+        self._ensure_loaded()
+        scores = []
+        for start in range(0, len(texts), self.batch_size):
+            if deadline is not None and time.monotonic() > deadline:
+                raise RerankTimeout()
+            scores.extend(self._score_batch(query, texts[start:start + self.batch_size]))
+        return scores
+
+    def _ensure_loaded(self):
+        if self._session is not None:
+            return
+        with self._load_lock:
+            if self._session is not None:
+                return
+
+            import onnxruntime as ort
+            from huggingface_hub import hf_hub_download
+            from tokenizers import Tokenizer
+
+            model_path = hf_hub_download(self.model_name, self.onnx_file)
+            tokenizer_path = hf_hub_download(self.model_name, "tokenizer.json")
+
+            tokenizer = Tokenizer.from_file(tokenizer_path)
+            # Keep the question whole; trim the passage
+            tokenizer.enable_truncation(max_length=MAX_PAIR_LENGTH, strategy="only_second")
+            tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+            options = ort.SessionOptions()
+            if self.num_threads:
+                options.intra_op_num_threads = self.num_threads
+                options.inter_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+            session = ort.InferenceSession(
+                model_path, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+
+            self._tokenizer = tokenizer
+            self._input_names = {i.name for i in session.get_inputs()}
+            self._session = session
+
+    def _score_batch(self, query, texts):
+        import numpy as np
+
+        encodings = self._tokenizer.encode_batch(
+            [(query, text.replace("\n", " ")) for text in texts]
+        )
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": input_ids,
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        logits = self._session.run(None, feeds)[0]
+        return logits.reshape(len(texts), -1)[:, 0].tolist()
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Over-fetches candidates from `base` and reorders them with a
+    cross-encoder, returning the best `top_n`.
+
+    Reranking has a hard `budget` in seconds. If the scores are not
+    ready in time (model still loading, CPU busy), or the model cannot
+    be loaded at all, the base retriever's order is used instead. A slow
+    reranker therefore never delays the answer by more than the budget.
+    """
+
+    base: BaseRetriever
+    reranker: object
+    top_n: int = 3
+    budget: float = 0.15
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        candidates = self.base.invoke(query)
+        deadline = time.monotonic() + self.budget
+        with metrics.trace("query.rerank", candidates=len(candidates)) as span:
+            try:
+                scores = self.reranker.score(
+                    query, [doc.page_content for doc in candidates], deadline=deadline
+                )
+            except Exception as e:
+                return self._fallback(candidates, e, span)
+        return self._reorder(candidates, scores)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        candidates = await self.base.ainvoke(query)
+        deadline = time.monotonic() + self.budget
+        with metrics.trace("query.rerank", candidates=len(candidates)) as span:
+            try:
+                scores = await self.reranker.ascore(
+                    query, [doc.page_content for doc in candidates], deadline=deadline
+                )
+            except Exception as e:
+                return self._fallback(candidates, e, span)
+        return self._reorder(candidates, scores)
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _reorder(self, candidates, scores):
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        return [candidates[i] for i in order[:self.top_n]]
+
+    def _fallback(self, candidates, error, span):
+        span["fallback"] = 1
+        metrics.inc("query.rerank.timeout" if isinstance(error, RerankTimeout) else "query.rerank.error")
+        return candidates[:self.top_n]
+
+
+def rerank_config_from_env():
+    """
+    Returns None when reranking is off, else a dict of settings.
+
+    Optional env vars:
+        RECALL_RERANK            — 1 enables the cross-encoder stage (default 0)
+        RECALL_RERANK_MODEL      — HF repo with an onnx/model.onnx export
+                                   (default cross-encoder/ms-marco-MiniLM-L-6-v2)
+        RECALL_RERANK_FETCH_K    — candidates retrieved for reranking (default 30)
+        RECALL_RERANK_TOP_N      — chunks kept after reranking (default 3)
+        RECALL_RERANK_BUDGET_MS  — latency budget before falling back (default 150)
+        RECALL_RERANK_THREADS    — onnxruntime intra-op threads (default: onnxruntime's choice)
+    """
+    if os.getenv("RECALL_RERANK", "0") == "0":
+        return None
+    threads = os.getenv("RECALL_RERANK_THREADS", "")
+    return {
+        "model_name": os.getenv("RECALL_RERANK_MODEL", DEFAULT_RERANK_MODEL),
+        "fetch_k": int(os.getenv("RECALL_RERANK_FETCH_K", 30)),
+        "top_n": int(os.getenv("RECALL_RERANK_TOP_N", 3)),
+        "budget": float(os.getenv("RECALL_RERANK_BUDGET_MS", 150)) / 1000,
+        "num_threads": int(threads) if threads else None,
+    }
@@ -0,0 +1,223 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from lean_store import LeanVectorStore
+from metrics import metrics
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to `window` seconds (or until
+    `max_batch` are waiting) and serves them with one
+    `process(items) -> results` call.
+
+    The first request of a window leads it: it waits out the window,
+    runs the batch on its own thread and fans the results out; the others
+    just wait for theirs. Requests arriving while a batch is running open
+    the next window, so batches overlap instead of queueing. There is
+    only ever one leader collecting: it hands leadership on as soon as it
+    has taken its batch, unless more than `max_batch` were waiting, in
+    which case it serves the overflow itself afterwards. Requests
+    with the same key inside one window share a single item and result,
+    so a burst of sessions asking the same thing costs one batch slot.
+    No background thread is kept, so a batcher dies with its owner.
+    """
+
+    def __init__(self, process, window=0.003, max_batch=32, name="batch"):
+        self.process = process
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.name = name
+        self._pending = {}            # key -> (item, future)
+        self._leading = False         # a leader is collecting or running a batch
+        self._cond = threading.Condition()
+
+    def __call__(self, key, item):
+        future, leader = self._enqueue(key, item)
+        if leader:
+            self._lead()
+        return future.result()
+
+    async def acall(self, key, item):
+        future, leader = self._enqueue(key, item)
+        if leader:
+            await asyncio.to_thread(self._lead)
+        return await asyncio.wrap_future(future)
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _enqueue(self, key, item):
+        """
+        Returns (future, leader): `leader` is True when no leader is
+        active, and the caller must then call _lead().
+        """
+        with self._cond:
+            pending = self._pending.get(key)
+            if pending is not None:
+                metrics.inc(f"{self.name}.deduped")
+                return pending[1], False
+            future = Future()
+            self._pending[key] = (item, future)
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+            leader = not self._leading
+            self._leading = True
+            return future, leader
+
+    def _lead(self):
+        deadline = time.monotonic() + self.window
+        while True:
+            with self._cond:
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                keys = list(self._pending)[:self.max_batch]
+                batch = [self._pending.pop(key) for key in keys]
+                # With nothing left over, the next request leads the next
+                # window while this batch runs
+                overflow = bool(self._pending)
+                if not overflow:
+                    self._leading = False
+            self._run(batch)
+            if not overflow:
+                return
+            # The overflow has waited out a window already — serve it now
+            deadline = time.monotonic()
+
+    def _run(self, batch):
+        if not batch:
+            return
+        metrics.observe(f"{self.name}.size", len(batch))
+        try:
+            results = self.process([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+class BatchedQueryEmbeddings(Embeddings):
+    """
+    Embeds concurrent queries together: every embed_query within the
+    batching window becomes one embed_documents call on `base`. Document
+    embedding (indexing) passes straight through.
+    """
+
+    def __init__(self, base, window=0.003, max_batch=32):
+        self.base = base
+        self._batcher = MicroBatcher(
+            base.embed_documents, window=window, max_batch=max_batch, name="retrieval.embed_batch"
+        )
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    async def aembed_documents(self, texts):
+        return await self.base.aembed_documents(texts)
+
+    def embed_query(self, text):
+        return self._batcher(text, text)
+
+    async def aembed_query(self, text):
+        return await self._batcher.acall(text, text)
+
+
+class BatchedSearchStore(VectorStore):
+    """
+    Read-only view of a FAISS or LeanVectorStore whose similarity
+    searches are micro-batched: the query vectors of concurrent searches
+    are stacked and run as one matrix search over the shared index, and
+    each caller gets its own top-k back.
+    """
+
+    def __init__(self, vector_store, window=0.003, max_batch=32):
+        self.vector_store = vector_store
+        self._batcher = MicroBatcher(
+            self._search_batch, window=window, max_batch=max_batch, name="retrieval.search_batch"
+        )
+
+    @property
+    def embeddings(self):
+        return self.vector_store.embeddings
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("BatchedSearchStore is read-only.")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Wrap an existing vector store instead.")
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k)
+
+    async def asimilarity_search(self, query, k=4, **kwargs):
+        vector = await self.embeddings.aembed_query(query)
+        return await self._batcher.acall(_search_key(vector, k), (vector, k))
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return self._batcher(_search_key(embedding, k), (embedding, k))
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _search_batch(self, requests):
+        queries = np.asarray([vector for vector, _ in requests], dtype=np.float32)
+        k = max(k for _, k in requests)
+        if isinstance(self.vector_store, LeanVectorStore):
+            results = self.vector_store.similarity_search_by_vectors(queries, k=k)
+        else:
+            results = _faiss_search_batch(self.vector_store, queries, k)
+        return [docs[:k] for docs, (_, k) in zip(results, requests)]
+
+
+def _faiss_search_batch(vector_store, queries, k):
+    if getattr(vector_store, "_normalize_L2", False):
+        import faiss
+
+        faiss.normalize_L2(queries)
+    _, indices = vector_store.index.search(queries, k)
+    results = []
+    for row in indices:
+        docs = []
+        for i in row:
+            if i == -1:
+                continue
+            doc_id = vector_store.index_to_docstore_id[i]
+            doc = vector_store.docstore.search(doc_id)
+            if doc.id is None:
+                doc = Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata)
+            docs.append(doc)
+        results.append(docs)
+    return results
+
+
+def _search_key(vector, k):
+    return (np.asarray(vector, dtype=np.float32).tobytes(), k)
+
+
+def batching_config_from_env():
+    """
+    Returns None when retrieval micro-batching is off, else (window
+    seconds, max batch size).
+
+    Optional env vars:
+        RECALL_RETRIEVAL_BATCH_WINDOW_MS  — how long concurrent query embeddings
+                                            and searches are collected (default 3;
+                                            0 disables batching)
+        RECALL_RETRIEVAL_BATCH_MAX        — requests per batch (default 32)
+    """
+    window_ms = float(os.getenv("RECALL_RETRIEVAL_BATCH_WINDOW_MS", 3))
+    if window_ms <= 0:
+        return None
+    return window_ms / 1000, int(os.getenv("RECALL_RETRIEVAL_BATCH_MAX", 32))
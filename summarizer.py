@@ -0,0 +1,199 @@
+import os
+import re
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from context_packer import count_tokens
+from transcript_chunking import format_timestamp
+
+
+_SUMMARY_QUERY = re.compile(
+    r"\b(summar(y|ise|ize|ising|izing)|tl;?dr|overview|recap|gist|"
+    r"main (points|ideas|topics|takeaways)|key (points|ideas|takeaways)|"
+    r"what('s| is) (this|the) video about|what does (this|the) video (cover|talk about))\b",
+    re.IGNORECASE,
+)
+
+_MAP_PROMPT = PromptTemplate(
+    template="""
+        Summarize this part of a video transcript in 3-5 concise sentences.
+        Keep names, numbers and conclusions. Do not add anything that is
+        not in the text.
+
+        Transcript:
+        {text}
+
+        Summary:
+        """,
+    input_variables=["text"]
+)
+
+_REDUCE_PROMPT = PromptTemplate(
+    template="""
+        Below are summaries of consecutive sections of one video, in order.
+        Combine them into a single coherent summary of 4-6 sentences that
+        covers the whole span.
+
+        Section summaries:
+        {text}
+
+        Combined summary:
+        """,
+    input_variables=["text"]
+)
+
+
+def is_summary_query(question):
+    """
+    True for whole-video questions ("summarize this video", "key
+    takeaways", "what is this video about") that 6 retrieved chunks
+    cannot answer.
+    """
+    return bool(_SUMMARY_QUERY.search(question))
+
+
+class VideoSummarizer:
+    """
+    Map-reduce summaries of a whole transcript.
+
+    Map: chunks (in transcript order) are grouped `group_size` at a time
+    and each group is summarised — the groups run concurrently through
+    the LLM's batch API. Reduce: while the section summaries exceed
+    `context_budget` tokens, consecutive sections are combined the same
+    way, and a final call produces a whole-video overview.
+
+    The result is computed once (at index time or on the first summary
+    question), optionally persisted via `load` / `save` callbacks, and
+    served to later summary questions as a single compact context.
+    """
+
+    def __init__(
+        self,
+        docs,
+        llm,
+        group_size=8,
+        max_concurrency=4,
+        context_budget=2048,
+        load=None,
+        save=None,
+    ):
+        self.docs = docs
+        self.group_size = max(1, group_size)
+        self.max_concurrency = max_concurrency
+        self.context_budget = context_budget
+        self._map_chain = _MAP_PROMPT | llm | StrOutputParser()
+        self._reduce_chain = _REDUCE_PROMPT | llm | StrOutputParser()
+        self._load = load
+        self._save = save
+        self._result = None
+        self._lock = threading.Lock()
+
+    def summary_docs(self):
+        """
+        Returns the overview followed by the top-level section summaries
+        as Documents, building them on first call.
+        """
+        result = self._ensure()
+        docs = [Document(page_content=result["overview"], metadata={"kind": "overview"})]
+        for section in result["sections"]:
+            metadata = {"kind": "section"}
+            if section["start"] is not None:
+                metadata["start"] = section["start"]
+                metadata["end"] = section["end"]
+            docs.append(Document(page_content=section["text"], metadata=metadata))
+        return docs
+
+    def format_context(self, docs):
+        parts = []
+        for doc in docs:
+            if doc.metadata.get("kind") == "overview":
+                parts.append(f"Overview:\n{doc.page_content}")
+            elif "start" in doc.metadata:
+                span = f"{format_timestamp(doc.metadata['start'])}–{format_timestamp(doc.metadata['end'])}"
+                parts.append(f"[{span}] {doc.page_content}")
+            else:
+                parts.append(doc.page_content)
+        return "\n\n".join(parts)
+
+    def ensure(self):
+        """
+        Builds the summaries now (for eager, index-time precomputation).
+        """
+        self._ensure()
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _ensure(self):
+        if self._result is not None:
+            return self._result
+        with self._lock:
+            if self._result is None:
+                result = self._load() if self._load else None
+                if result is None:
+                    result = self._build()
+                    if self._save:
+                        self._save(result)
+                self._result = result
+        return self._result
+
+    def _build(self):
+        # ── Map ──────────────────────────────────────────────────────────────
+        sections = [
+            _section(group)
+            for group in _groups(
+                [(doc.page_content, doc.metadata.get("start"), doc.metadata.get("end")) for doc in self.docs],
+                self.group_size,
+            )
+        ]
+        texts = self._summarize(self._map_chain, [s["text"] for s in sections])
+        for section, text in zip(sections, texts):
+            section["text"] = text
+
+        # ── Reduce until the sections fit the query-time budget ─────────────
+        while len(sections) > 1 and sum(count_tokens(s["text"]) for s in sections) > self.context_budget:
+            groups = _groups(
+                [(s["text"], s["start"], s["end"]) for s in sections], self.group_size
+            )
+            merged = [_section(group, sep="\n") for group in groups]
+            texts = self._summarize(self._reduce_chain, [s["text"] for s in merged])
+            for section, text in zip(merged, texts):
+                section["text"] = text
+            sections = merged
+
+        overview = sections[0]["text"] if len(sections) == 1 else self._reduce_chain.invoke(
+            {"text": "\n".join(s["text"] for s in sections)}
+        )
+        return {"overview": overview, "sections": sections}
+
+    def _summarize(self, chain, texts):
+        return chain.batch(
+            [{"text": text} for text in texts],
+            config={"max_concurrency": self.max_concurrency},
+        )
+
+
+def summary_mode_from_env():
+    """
+    Optional env var:
+        RECALL_SUMMARY_MODE  — lazy (default: build on first summary
+                               question) | eager (build at index time) | off
+    """
+    mode = os.getenv("RECALL_SUMMARY_MODE", "lazy").strip().lower()
+    return mode if mode in ("lazy", "eager", "off") else "lazy"
+
+
+def _groups(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _section(group, sep=" "):
+    starts = [start for _, start, _ in group if start is not None]
+    ends = [end for _, _, end in group if end is not None]
+    return {
+        "text": sep.join(text for text, _, _ in group),
+        "start": min(starts) if starts else None,
+        "end": max(ends) if ends else None,
+    }
@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from context_packer import pack_context
+
+
+def _chunk(text, start, end, video_id):
+    return Document(
+        page_content=text,
+        metadata={"start": start, "end": end, "video_id": video_id,
+                  "url": f"https://www.youtube.com/watch?v={video_id}&t={start}s"},
+    )
+
+
+def test_collection_chunks_from_different_videos_are_not_merged():
+    a = _chunk("first video talks about vectors", 0, 30, "vidA")
+    b = _chunk("second video talks about prompts", 10, 40, "vidB")
+
+    packed = pack_context([a, b])
+
+    assert [doc.page_content for doc in packed] == [a.page_content, b.page_content]
+    assert [doc.metadata["video_id"] for doc in packed] == ["vidA", "vidB"]
+    assert packed[1].metadata["url"] == b.metadata["url"]
+
+
+def test_collection_chunks_from_different_videos_with_same_text_are_kept():
+    a = _chunk("thanks for watching", 0, 5, "vidA")
+    b = _chunk("thanks for watching", 0, 5, "vidB")
+
+    packed = pack_context([a, b])
+
+    assert [doc.metadata["video_id"] for doc in packed] == ["vidA", "vidB"]
+
+
+def test_adjacent_chunks_of_one_video_still_merge():
+    a = _chunk("part one", 0, 30, "vidA")
+    b = _chunk("part two", 30, 60, "vidA")
+
+    packed = pack_context([b, a])
+
+    assert len(packed) == 1
+    assert packed[0].page_content == "part one part two"
+    assert (packed[0].metadata["start"], packed[0].metadata["end"]) == (0, 60)
@@ -0,0 +1,82 @@
+import json
+import threading
+
+import pytest
+
+from embedding_client import BatchedEmbeddings, EmbeddingRequestError, InferenceEndpointEmbeddings
+
+
+def _fake_endpoint(http_server, failures=None):
+    """
+    Feature-extraction stand-in: embeds each input as [len(text), index].
+    `failures` is a list of (status, retry_after) answered, in order,
+    before any request succeeds.
+    """
+    failures = list(failures or [])
+    lock = threading.Lock()
+    requests = []
+
+    def handle(request):
+        inputs = json.loads(request.body)["inputs"]
+        with lock:
+            requests.append(inputs)
+            failure = failures.pop(0) if failures else None
+        if failure is not None:
+            status, retry_after = failure
+            request.send_response(status)
+            if retry_after is not None:
+                request.send_header("Retry-After", str(retry_after))
+            request.end_headers()
+            request.wfile.write(b"busy")
+            return
+        body = json.dumps([[float(len(text)), float(i)] for i, text in enumerate(inputs)]).encode()
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.end_headers()
+        request.wfile.write(body)
+
+    return http_server(handle), requests
+
+
+def test_documents_are_batched_and_keep_input_order(http_server):
+    url, requests = _fake_endpoint(http_server)
+    embeddings = BatchedEmbeddings(InferenceEndpointEmbeddings(url), batch_size=4, max_workers=3)
+    texts = ["x" * n for n in range(1, 11)]
+
+    vectors = embeddings.embed_documents(texts)
+
+    assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+    assert sorted(len(batch) for batch in requests) == [2, 4, 4]
+    assert len(embeddings.batch_stats) == 3
+
+
+def test_transient_errors_are_retried(http_server):
+    url, requests = _fake_endpoint(http_server, failures=[(503, None), (429, 0)])
+    embeddings = BatchedEmbeddings(InferenceEndpointEmbeddings(url), backoff=0.01)
+
+    vectors = embeddings.embed_documents(["a", "bb"])
+
+    assert vectors == [[1.0, 0.0], [2.0, 1.0]]
+    assert len(requests) == 3
+    assert embeddings.batch_stats[-1].attempts == 3
+
+
+def test_client_errors_are_not_retried(http_server):
+    url, requests = _fake_endpoint(http_server, failures=[(400, None)])
+    embeddings = BatchedEmbeddings(InferenceEndpointEmbeddings(url), backoff=0.01)
+
+    with pytest.raises(EmbeddingRequestError) as error:
+        embeddings.embed_documents(["a"])
+
+    assert error.value.status_code == 400
+    assert len(requests) == 1
+
+
+def test_retries_give_up_after_max_retries(http_server):
+    url, requests = _fake_endpoint(http_server, failures=[(500, None)] * 10)
+    embeddings = BatchedEmbeddings(InferenceEndpointEmbeddings(url), max_retries=2, backoff=0.01)
+
+    with pytest.raises(EmbeddingRequestError):
+        embeddings.embed_query("a")
+
+    assert len(requests) == 3
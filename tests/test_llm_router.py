@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from llm_router import LLMRouter, _openai_backend
+
+
+def _fake_openai(http_server, mode="ok", delay=0.0, calls=None):
+    """
+    OpenAI-compatible chat-completions server. `mode` is "ok", "error"
+    (HTTP 500) or "hang" (no response for a long time).
+    """
+    def handle(request):
+        if request.command == "GET":
+            request.send_response(200)
+            request.end_headers()
+            return
+        body = json.loads(request.body)
+        if calls is not None:
+            calls.append(body)
+        if mode == "error":
+            request.send_response(500)
+            request.end_headers()
+            return
+        if mode == "hang":
+            time.sleep(3)
+            return
+        time.sleep(delay)
+        words = f"answer to {body['messages'][-1]['content']}".split()
+        request.send_response(200)
+        if not body["stream"]:
+            request.send_header("Content-Type", "application/json")
+            request.end_headers()
+            content = " ".join(words)
+            request.wfile.write(json.dumps({"choices": [{"message": {"content": content}}]}).encode())
+            return
+        request.send_header("Content-Type", "text/event-stream")
+        request.end_headers()
+        for word in words:
+            chunk = {"choices": [{"delta": {"content": word + " "}}]}
+            request.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            request.wfile.flush()
+        request.wfile.write(b"data: [DONE]\n\n")
+
+    return f"{http_server(handle)}/v1"
+
+
+def _router(*urls, timeout=1.0, concurrency=4):
+    backends = [
+        _openai_backend(f"b{i}", url, "model", "", concurrency, timeout)
+        for i, url in enumerate(urls)
+    ]
+    return LLMRouter(backends=backends, timeout=timeout)
+
+
+def test_fails_over_on_server_error(http_server):
+    router = _router(_fake_openai(http_server, "error"), _fake_openai(http_server))
+
+    answer = router.invoke([HumanMessage("q")])
+
+    assert answer.content.strip() == "answer to q"
+    assert not router.backends[0].healthy
+    assert router.backends[1].healthy
+
+
+def test_fails_over_on_timeout_async(http_server):
+    router = _router(_fake_openai(http_server, "hang"), _fake_openai(http_server), timeout=0.3)
+
+    answer = asyncio.run(router.ainvoke([HumanMessage("q")]))
+
+    assert answer.content.strip() == "answer to q"
+    assert not router.backends[0].healthy
+
+
+def test_all_backends_failing_raises(http_server):
+    router = _router(_fake_openai(http_server, "error"), _fake_openai(http_server, "error"))
+
+    with pytest.raises(RuntimeError, match="All LLM backends failed"):
+        router.invoke([HumanMessage("q")])
+
+
+def test_identical_concurrent_requests_share_one_generation(http_server):
+    calls = []
+    router = _router(_fake_openai(http_server, delay=0.2, calls=calls))
+
+    async def ask_all():
+        return await asyncio.gather(*[router.ainvoke([HumanMessage("same")]) for _ in range(8)])
+
+    answers = asyncio.run(ask_all())
+
+    assert {a.content for a in answers} == {answers[0].content}
+    assert len(calls) == 1
+
+
+def test_sync_and_async_requests_coalesce(http_server):
+    calls = []
+    router = _router(_fake_openai(http_server, delay=0.2, calls=calls))
+    results = []
+
+    thread = threading.Thread(
+        target=lambda: results.append(router.invoke([HumanMessage("mixed")]).content)
+    )
+    thread.start()
+    time.sleep(0.05)
+    results.append(asyncio.run(router.ainvoke([HumanMessage("mixed")])).content)
+    thread.join()
+
+    assert results[0] == results[1]
+    assert len(calls) == 1
+
+
+def test_cancelled_wait_for_slot_does_not_leak_it(http_server):
+    router = _router(_fake_openai(http_server), concurrency=1, timeout=2.0)
+    backend = router.backends[0]
+    assert backend.acquire(timeout=0)        # the only slot is busy
+
+    async def cancel_while_waiting():
+        task = asyncio.create_task(router.ainvoke([HumanMessage("q")]))
+        await asyncio.sleep(0.1)             # now waiting for the slot
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        backend.release()                    # the waiting thread gets it...
+        await asyncio.sleep(0.2)             # ...and must hand it back
+
+    asyncio.run(cancel_while_waiting())
+
+    assert backend.in_flight == 0
+    assert router.invoke([HumanMessage("after")]).content.strip() == "answer to after"
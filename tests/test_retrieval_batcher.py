@@ -0,0 +1,45 @@
+import threading
+import time
+
+from retrieval_batcher import MicroBatcher
+
+
+def _recording_batcher(**kwargs):
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        time.sleep(0.05)
+        return [item * 2 for item in items]
+
+    return MicroBatcher(process, **kwargs), batches
+
+
+def test_request_arriving_during_a_batch_never_yields_an_empty_batch():
+    batcher, batches = _recording_batcher(window=0.005)
+    first = threading.Thread(target=lambda: batcher(0, 0))
+    first.start()
+    time.sleep(0.02)                     # first batch is running
+
+    assert batcher(1, 1) == 2
+    first.join()
+    assert batches == [[0], [1]]
+    assert not batcher._leading
+
+
+def test_concurrent_requests_are_batched_and_deduplicated():
+    batcher, batches = _recording_batcher(window=0.05, max_batch=32)
+    results = {}
+
+    def ask(i):
+        results[i] = batcher(i % 5, i % 5)
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: 2 * (i % 5) for i in range(20)}
+    assert sum(len(batch) for batch in batches) == 5
+    assert all(batches)
@@ -0,0 +1,109 @@
+import time
+
+from youtube_utils import Segment, TranscriptService
+
+
+CAPTIONS = [Segment(0.0, 2.0, "hello there"), Segment(2.0, 4.0, "general kenobi")]
+DESCRIPTION = [Segment(None, None, "Title: t\n\nDescription:\nd")]
+NOTE = "Note: A full transcript could not be retrieved."
+
+
+class Tier:
+    """
+    Stubbed transcript tier returning `results` in turn (the last one
+    repeats), counting calls. A result may be an exception to raise.
+    """
+
+    def __init__(self, *results, delay=0.0):
+        self.results = list(results)
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, video_id):
+        self.calls += 1
+        time.sleep(self.delay)
+        result = self.results[min(self.calls, len(self.results)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_highest_priority_success_wins_even_if_slower():
+    captions = Tier((CAPTIONS, None), delay=0.1)
+    metadata = Tier((DESCRIPTION, NOTE))
+    service = TranscriptService([("captions", captions), ("metadata", metadata)])
+
+    assert service.fetch("vid") == (CAPTIONS, None)
+
+
+def test_tiers_run_concurrently():
+    tiers = [(f"t{i}", Tier((None, None), delay=0.2)) for i in range(3)]
+    tiers.append(("metadata", Tier((DESCRIPTION, NOTE), delay=0.2)))
+    service = TranscriptService(tiers)
+
+    start = time.perf_counter()
+    segments, note = service.fetch("vid")
+
+    assert (segments, note) == (DESCRIPTION, NOTE)
+    assert time.perf_counter() - start < 0.6
+
+
+def test_errors_and_empty_tiers_fall_through():
+    service = TranscriptService([
+        ("broken", Tier(RuntimeError("boom"))),
+        ("blank", Tier(([Segment(0.0, 1.0, "  ")], None))),
+        ("captions", Tier((CAPTIONS, None))),
+    ])
+
+    assert service.fetch("vid") == (CAPTIONS, None)
+
+
+def test_all_tiers_failing_reports_an_error():
+    service = TranscriptService([("broken", Tier(RuntimeError("boom")))])
+
+    segments, error = service.fetch("vid")
+
+    assert segments is None
+    assert "boom" in error
+
+
+def test_full_transcripts_are_cached(tmp_path):
+    captions = Tier((CAPTIONS, None))
+    service = TranscriptService([("captions", captions)], cache_dir=str(tmp_path))
+
+    service.fetch("vid")
+    segments, note = service.fetch("vid")
+
+    assert [tuple(s) for s in segments] == [tuple(s) for s in CAPTIONS]
+    assert captions.calls == 1
+
+
+def test_degraded_results_are_cached_only_briefly(tmp_path):
+    captions = Tier((None, None), (CAPTIONS, None))
+    metadata = Tier((DESCRIPTION, NOTE))
+    service = TranscriptService(
+        [("captions", captions), ("metadata", metadata)],
+        cache_dir=str(tmp_path),
+        fallback_ttl=0.2,
+    )
+
+    assert service.fetch("vid")[1] == NOTE
+    assert service.fetch("vid")[1] == NOTE          # still within fallback_ttl
+    time.sleep(0.3)
+    segments, note = service.fetch("vid")
+
+    assert note is None and segments[0].text == "hello there"
+    assert captions.calls == 2
+
+
+def test_degraded_results_are_not_cached_with_zero_fallback_ttl(tmp_path):
+    captions = Tier((None, None), (CAPTIONS, None))
+    service = TranscriptService(
+        [("captions", captions), ("metadata", Tier((DESCRIPTION, NOTE)))],
+        cache_dir=str(tmp_path),
+        fallback_ttl=0,
+    )
+
+    service.fetch("vid")
+
+    assert service.fetch("vid")[1] is None
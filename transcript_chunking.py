@@ -0,0 +1,70 @@
+from langchain_core.documents import Document
+
+from youtube_utils import timestamp_url
+
+
+def chunk_segments(segments, chunk_size=1000, video_id=None):
+    """
+    Packs transcript segments into chunks of at most `chunk_size`
+    characters, breaking only on segment boundaries.
+
+    Each chunk carries `start` / `end` (seconds) in its metadata, plus a
+    deep-link `url` when `video_id` is given. Because whole caption lines
+    are packed back to back there is no overlap between chunks, so a long
+    video yields ~20% fewer chunks to embed than a 1000/200 character
+    splitter. A single segment longer than `chunk_size` (e.g. the
+    description fallback) is split on its own and each piece keeps the
+    segment's timing.
+    """
+    docs = []
+    buffer = []
+    size = 0
+
+    def flush():
+        nonlocal size
+        if buffer:
+            text = " ".join(seg.text.strip() for seg in buffer)
+            docs.append(_make_doc(text, buffer[0].start, buffer[-1].end, video_id))
+        buffer.clear()
+        size = 0
+
+    for seg in segments:
+        text = seg.text.strip()
+        if not text:
+            continue
+
+        if len(text) > chunk_size:
+            flush()
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=0)
+            for piece in splitter.split_text(text):
+                docs.append(_make_doc(piece, seg.start, seg.end, video_id))
+            continue
+
+        if buffer and size + 1 + len(text) > chunk_size:
+            flush()
+        buffer.append(seg)
+        size += len(text) + (1 if size else 0)
+
+    flush()
+    return docs
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def _make_doc(text, start, end, video_id):
+    metadata = {}
+    if start is not None:
+        metadata["start"] = start
+        metadata["end"] = end if end is not None else start
+        if video_id:
+            metadata["url"] = timestamp_url(video_id, start)
+    return Document(page_content=text, metadata=metadata)
@@ -0,0 +1,194 @@
+import os
+import re
+import zlib
+
+import numpy as np
+
+from metrics import metrics
+from youtube_utils import Segment
+
+
+# Non-speech caption tags: [Music], [Applause], [ __ ], (laughter), ♪ …
+# Only known tags — other bracketed text ("[1]", "[Part 2]") is content.
+_NON_SPEECH = (
+    r"music(?: playing)?|applause|laughter|laughs|laughing|cheering|cheers"
+    r"|inaudible|silence|crosstalk|foreign|no audio|background noise|__"
+)
+_TAGS = re.compile(
+    rf"[\[(]\s*(?:{_NON_SPEECH})\s*[\])]"
+    r"|[♪♫]+"
+    r"|^\s*>>\s*",
+    re.IGNORECASE | re.MULTILINE,
+)
+_WORD = re.compile(r"\w+")
+
+# Part of the index cache key: bump when cleaning output changes
+CLEANING_VERSION = 2
+
+# Words of one cue compared against the end of the previous one
+_MAX_ROLLING_WORDS = 40
+# Shortest phrase collapsed when a rolling cue repeats it back to back —
+# shorter repeats ("no, no") are usually real speech
+_MIN_REPEAT_WORDS = 3
+_MAX_REPEAT_WORDS = 30
+
+_SHINGLE_WORDS = 5
+_MINHASH_PERMS = 64
+_LSH_BANDS = 16
+_MERSENNE = (1 << 31) - 1
+_rng = np.random.default_rng(0x5EED)
+_HASH_A = _rng.integers(1, _MERSENNE, _MINHASH_PERMS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, _MERSENNE, _MINHASH_PERMS, dtype=np.uint64)
+
+
+# ── Sanitation ──────────────────────────────────────────────────────────────
+
+def strip_tags(text):
+    """
+    Removes non-speech tags and speaker-change markers and collapses
+    whitespace.
+    """
+    return " ".join(_TAGS.sub(" ", text).split())
+
+
+def clean_segments(segments):
+    """
+    Sanitised copy of caption Segments: non-speech tags removed, cues
+    left empty dropped, and rolling-caption duplication collapsed.
+
+    Auto-generated captions roll: each cue starts before the previous
+    one ends and repeats its tail ("so today we" / "so today we are
+    going to"), and a two-line cue may repeat a phrase back to back. Only
+    for such time-overlapping cues are the words shared with the end of
+    the previous cue cut and back-to-back repeats inside the cue
+    collapsed; a cue that adds nothing only extends the previous cue's
+    end time. Cues that do not overlap in time (manual captions) keep
+    every word, so repetition in real speech survives. Untimed segments
+    (the description fallback) are passed through unchanged.
+    """
+    cleaned = []
+    prev_words = []
+    prev_end = None
+    for seg in segments:
+        if seg.start is None:
+            cleaned.append(seg)
+            prev_words, prev_end = [], None
+            continue
+        text = strip_tags(seg.text)
+        if not text:
+            continue
+        rolling = prev_end is not None and seg.start < prev_end
+        prev_end = seg.end
+        words = _collapse_repeats(text.split()) if rolling else text.split()
+        overlap = _rolling_overlap(prev_words, words) if rolling else 0
+        if cleaned and overlap == len(words):
+            last = cleaned[-1]
+            if seg.end is not None:
+                cleaned[-1] = Segment(last.start, max(last.end or seg.end, seg.end), last.text)
+            continue
+        cleaned.append(Segment(seg.start, seg.end, " ".join(words[overlap:])))
+        prev_words = words
+    return cleaned
+
+
+def clean_text(text):
+    """
+    Plain-text counterpart of clean_segments(). Without cue timings there
+    is no telling rolling duplication from repetition in speech, so only
+    non-speech tags are removed.
+    """
+    return strip_tags(text)
+
+
+# ── Near-duplicate chunks ───────────────────────────────────────────────────
+
+def drop_near_duplicates(chunks, threshold=0.85):
+    """
+    Drops chunks whose word-shingle Jaccard similarity to an earlier kept
+    chunk is at least `threshold` (repeated intros, sponsor reads, songs
+    with a chorus), keeping the first occurrence and transcript order.
+
+    Similarity is estimated with 64-permutation MinHash; candidate pairs
+    come from LSH buckets (16 bands of 4), so the cost stays linear in
+    the number of chunks.
+    """
+    rows = _MINHASH_PERMS // _LSH_BANDS
+    buckets = {}
+    kept, kept_signatures = [], []
+    for chunk in chunks:
+        signature = _minhash(chunk.page_content)
+        bands = [(b, signature[b * rows:(b + 1) * rows].tobytes()) for b in range(_LSH_BANDS)]
+        candidates = {i for band in bands for i in buckets.get(band, ())}
+        if any(np.mean(kept_signatures[i] == signature) >= threshold for i in candidates):
+            continue
+        for band in bands:
+            buckets.setdefault(band, []).append(len(kept))
+        kept.append(chunk)
+        kept_signatures.append(signature)
+
+    metrics.inc("index.dedup.dropped", len(chunks) - len(kept))
+    return kept
+
+
+# ── Internal helpers ────────────────────────────────────────────────────────
+
+def _normalize(word):
+    return "".join(_WORD.findall(word.lower()))
+
+
+def _rolling_overlap(prev_words, words):
+    """
+    Number of leading `words` that repeat the end of `prev_words`
+    (compared case- and punctuation-insensitively). Single-word overlaps
+    are ignored unless they are the whole cue.
+    """
+    prev = [_normalize(w) for w in prev_words[-_MAX_ROLLING_WORDS:]]
+    cur = [_normalize(w) for w in words[:_MAX_ROLLING_WORDS]]
+    for n in range(min(len(prev), len(cur)), 0, -1):
+        if prev[-n:] == cur[:n] and (n > 1 or n == len(words)):
+            return n
+    return 0
+
+
+def _collapse_repeats(words):
+    out, keys = [], []
+    for word in words:
+        out.append(word)
+        keys.append(_normalize(word))
+        # If the last n words repeat the n before them, drop the repeat
+        for n in range(_MIN_REPEAT_WORDS, min(_MAX_REPEAT_WORDS, len(keys) // 2) + 1):
+            if keys[-1] == keys[-n - 1] and keys[-n:] == keys[-2 * n:-n]:
+                del out[-n:], keys[-n:]
+                break
+    return out
+
+
+def _minhash(text):
+    tokens = [t for t in (_normalize(w) for w in text.split()) if t]
+    if len(tokens) > _SHINGLE_WORDS:
+        shingles = {
+            " ".join(tokens[i:i + _SHINGLE_WORDS]) for i in range(len(tokens) - _SHINGLE_WORDS + 1)
+        }
+    else:
+        shingles = {" ".join(tokens)}
+    hashes = np.array(
+        [zlib.crc32(s.encode("utf-8")) % _MERSENNE for s in shingles], dtype=np.uint64
+    )
+    return ((np.outer(hashes, _HASH_A) + _HASH_B) % _MERSENNE).min(axis=0)
+
+
+def cleaning_config_from_env():
+    """
+    Returns the transcript sanitation settings.
+
+    Optional env vars:
+        RECALL_TRANSCRIPT_CLEAN  — 0 keeps captions as fetched: non-speech tags
+                                   and rolling duplicates included (default 1)
+        RECALL_DEDUP_THRESHOLD   — MinHash Jaccard above which a chunk is dropped
+                                   as a near-duplicate of an earlier one
+                                   (default 0.85; 0 disables)
+    """
+    return {
+        "clean": os.getenv("RECALL_TRANSCRIPT_CLEAN", "1") != "0",
+        "dedup_threshold": float(os.getenv("RECALL_DEDUP_THRESHOLD", 0.85)),
+    }
@@ -0,0 +1,191 @@
+import os
+
+import numpy as np
+
+
+INDEX_TYPES = ("flat", "hnsw", "fp16", "sq8", "ivfpq")
+
+# HNSW only pays off once exhaustive search starts to hurt
+HNSW_MIN_CHUNKS = 10000
+HNSW_M = 32
+HNSW_EF_SEARCH = 128
+# IVF-PQ needs enough vectors to train its coarse and PQ codebooks
+IVFPQ_MIN_CHUNKS = 10000
+IVFPQ_NPROBE = 16
+
+
+def estimate_bytes(index_type, n, dim):
+    """
+    Approximate resident size of `n` vectors of width `dim`.
+    """
+    if index_type == "flat":
+        return n * dim * 4
+    if index_type == "hnsw":
+        return n * (dim * 4 + HNSW_M * 2 * 4)
+    if index_type == "fp16":
+        return n * dim * 2
+    if index_type == "sq8":
+        return n * dim
+    if index_type == "ivfpq":
+        nlist = _nlist(n)
+        return n * (_pq_m(dim) + 8) + nlist * dim * 4 + 256 * dim * 4
+    raise ValueError(f"Unknown index type '{index_type}'.")
+
+
+def choose_index_type(n, dim, memory_budget=None):
+    """
+    Picks an index type for `n` vectors.
+
+    Without a budget: exact flat search, or HNSW once the index is large
+    enough for search time to matter. With a budget (bytes): the least
+    lossy type that fits, falling back to the smallest one. Types that
+    cannot be trained on `n` vectors are skipped.
+    """
+    candidates = ["flat", "fp16", "sq8", "ivfpq"]
+    if n >= HNSW_MIN_CHUNKS:
+        candidates.insert(0, "hnsw")
+    candidates = [t for t in candidates if t != "ivfpq" or n >= IVFPQ_MIN_CHUNKS]
+
+    if memory_budget is None:
+        return candidates[0]
+    for index_type in candidates:
+        if estimate_bytes(index_type, n, dim) <= memory_budget:
+            return index_type
+    return min(candidates, key=lambda t: estimate_bytes(t, n, dim))
+
+
+def build_index(index_type, vectors):
+    """
+    Builds and fills a FAISS index of `index_type` (L2 metric, like the
+    flat index LangChain creates) from an (n, dim) float32 array. Training
+    happens here, on the vectors themselves. Row i of `vectors` is id i.
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+    if index_type == "ivfpq" and n < IVFPQ_MIN_CHUNKS:
+        index_type = "sq8"      # too few vectors to train the codebooks
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+    elif index_type == "fp16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16)
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+    elif index_type == "ivfpq":
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, _nlist(n), _pq_m(dim), 8)
+    else:
+        raise ValueError(
+            f"Unknown index type '{index_type}'. Choose one of: {', '.join(INDEX_TYPES)}."
+        )
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    configure_search(index)
+    return index
+
+
+def configure_search(index):
+    """
+    Applies search-time settings, which FAISS does not persist — call it
+    again after reading an index from disk. IVF indexes also get a direct
+    map so vectors can be reconstructed (e.g. when merged into a
+    collection).
+    """
+    import faiss
+
+    # The downcast view does not own the index; `index` keeps it alive
+    typed = faiss.downcast_index(index)
+    if isinstance(typed, faiss.IndexHNSW):
+        typed.hnsw.efSearch = max(typed.hnsw.efSearch, HNSW_EF_SEARCH)
+    elif isinstance(typed, faiss.IndexIVF):
+        typed.nprobe = min(typed.nlist, IVFPQ_NPROBE)
+        if typed.direct_map.type == faiss.DirectMap.NoMap:
+            typed.make_direct_map()
+    return index
+
+
+def index_type_of(index):
+    import faiss
+
+    typed = faiss.downcast_index(index)
+    if isinstance(typed, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(typed, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(typed, faiss.IndexScalarQuantizer):
+        qtype = typed.sq.qtype
+        return "fp16" if qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "flat"
+
+
+def index_bytes(index):
+    """
+    Serialized size of a FAISS index — close to its resident size.
+    """
+    import faiss
+
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def recall_vs_flat(index, vectors, k=6, sample=200, seed=0):
+    """
+    Fraction of the exact top-k neighbours that `index` also returns,
+    over a sample of stored vectors used as queries.
+    """
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n = len(vectors)
+    if n == 0:
+        return 1.0
+    k = min(k, n)
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(n, size=min(sample, n), replace=False)]
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+    _, found = index.search(queries, k)
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return hits / truth.size
+
+
+def index_config_from_env():
+    """
+    Returns (index_type, memory_budget_bytes) from env vars; index_type
+    "auto" means choose_index_type() decides per video.
+
+    Optional env vars:
+        RECALL_INDEX_TYPE       — auto (default) | flat | hnsw | fp16 | sq8 | ivfpq
+        RECALL_INDEX_MEMORY_MB  — per-index vector budget for "auto" (default: none)
+    """
+    index_type = os.getenv("RECALL_INDEX_TYPE", "auto").strip().lower()
+    if index_type != "auto" and index_type not in INDEX_TYPES:
+        raise ValueError(
+            f"Unknown RECALL_INDEX_TYPE '{index_type}'. "
+            f"Choose auto or one of: {', '.join(INDEX_TYPES)}."
+        )
+    budget_mb = os.getenv("RECALL_INDEX_MEMORY_MB", "")
+    budget = int(float(budget_mb) * 1024 * 1024) if budget_mb else None
+    return index_type, budget
+
+
+# ── Internal helpers ────────────────────────────────────────────────────────
+
+def _nlist(n):
+    # ~4·sqrt(n) lists, each with enough points to train its centroid
+    return max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+
+def _pq_m(dim):
+    # Largest sub-quantizer count with >= 8 dims each that divides dim
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
@@ -0,0 +1,137 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from lean_store import LeanVectorStore
+
+
+class VideoCollection:
+    """
+    Many videos in one FAISS index, with `video_id` in every chunk's
+    metadata so queries can be scoped to a subset of the collection.
+
+    Each video is first indexed on its own (so the per-video index cache
+    is reused), then its vectors are copied into the shared index.
+    Removing a video deletes only its vectors — no full rebuild.
+
+    `build_store(transcript, video_id)` returns a per-video FAISS store
+    or LeanVectorStore; the shared index is always FAISS, which supports
+    deletion and metadata filters;
+    `fetch(video_id)` returns (transcript, error) like
+    get_transcript_segments().
+    """
+
+    def __init__(self, embeddings, build_store, fetch, max_workers=4):
+        self.embeddings = embeddings
+        self.build_store = build_store
+        self.fetch = fetch
+        self.max_workers = max(1, max_workers)
+        self.vector_store = None
+        self.video_ids = {}           # video_id -> [docstore ids]
+        self.version = 0
+        self._lock = threading.Lock()
+
+    # ── Public API ──────────────────────────────────────────────────────────
+
+    def add_videos(self, video_ids, on_progress=None):
+        """
+        Fetches and indexes videos in parallel, merging each into the
+        shared index as soon as it is ready. Returns {video_id: error}
+        for videos that could not be added.
+
+        `on_progress(done, total, video_id)` is called after each video.
+        """
+        pending = [vid for vid in dict.fromkeys(video_ids) if vid not in self.video_ids]
+        errors = {}
+        if not pending:
+            return errors
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+            futures = {pool.submit(self._index_one, vid): vid for vid in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                video_id = futures[future]
+                try:
+                    store, err = future.result()
+                except Exception as e:
+                    store, err = None, str(e)
+                if store is None:
+                    errors[video_id] = err or "No transcript available."
+                else:
+                    self._merge(video_id, store)
+                if on_progress:
+                    on_progress(done, len(pending), video_id)
+        return errors
+
+    def add_video(self, video_id, transcript):
+        """
+        Indexes an already-fetched transcript into the collection.
+        """
+        if video_id in self.video_ids:
+            return
+        self._merge(video_id, self.build_store(transcript, video_id))
+
+    def remove_video(self, video_id):
+        with self._lock:
+            ids = self.video_ids.pop(video_id, None)
+            if ids:
+                self.vector_store.delete(ids)
+                self.version += 1
+
+    def as_retriever(self, video_ids=None, k=6, fetch_k=40):
+        """
+        Vector retriever over the whole collection, or only `video_ids`.
+        """
+        search_kwargs = {"k": k, "fetch_k": fetch_k}
+        if video_ids:
+            search_kwargs["filter"] = {"video_id": {"$in": list(video_ids)}}
+        return self.vector_store.as_retriever(search_kwargs=search_kwargs)
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    # ── Internal helpers ────────────────────────────────────────────────────
+
+    def _index_one(self, video_id):
+        transcript, err = self.fetch(video_id)
+        if not transcript:
+            return None, err
+        return self.build_store(transcript, video_id), None
+
+    def _merge(self, video_id, store):
+        """
+        Copies a per-video store's vectors into the shared index, tagging
+        each chunk with its video_id. The per-video store may be a
+        read-only memory-mapped cache entry, so it is never mutated.
+        """
+        if isinstance(store, LeanVectorStore):
+            ids = store.ids()
+            docs = list(store.docstore)
+            vectors = np.asarray(store.vectors, dtype=np.float32)
+            dim = store.dim
+        else:
+            ids = [store.index_to_docstore_id[i] for i in range(store.index.ntotal)]
+            docs = [store.docstore.search(doc_id) for doc_id in ids]
+            vectors = store.index.reconstruct_n(0, store.index.ntotal)
+            dim = store.index.d
+
+        with self._lock:
+            if video_id in self.video_ids:
+                return
+            if self.vector_store is None:
+                self.vector_store = _empty_store(self.embeddings, dim)
+            self.vector_store.add_embeddings(
+                zip([doc.page_content for doc in docs], vectors.tolist()),
+                metadatas=[{**doc.metadata, "video_id": video_id} for doc in docs],
+                ids=[f"{video_id}:{doc_id}" for doc_id in ids],
+            )
+            self.video_ids[video_id] = [f"{video_id}:{doc_id}" for doc_id in ids]
+            self.version += 1
+
+
+def _empty_store(embeddings, dim):
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    return FAISS(embeddings, faiss.IndexFlatL2(dim), InMemoryDocstore(), {})
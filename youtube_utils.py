@@ -1,6 +1,19 @@
 from urllib.parse import urlparse, parse_qs
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import os
+import re
 import html
+import json
+import threading
+import time
+
+from metrics import metrics
+
+
+# One caption line with its timing in seconds. start/end are None for
+# text without timing (e.g. the title + description fallback).
+Segment = namedtuple("Segment", ["start", "end", "text"])
 
 
 def extract_video_id(url):
@@ -16,10 +29,108 @@ def extract_video_id(url):
     return None
 
 
+def extract_playlist_id(url):
+    """
+    Returns the `list=` playlist ID from a YouTube URL, or None.
+    """
+    parsed_url = urlparse(url)
+    if "youtube.com" not in parsed_url.netloc and "youtu.be" not in parsed_url.netloc:
+        return None
+    return parse_qs(parsed_url.query).get("list", [None])[0]
+
+
+def extract_channel_id(url):
+    """
+    Returns the channel from a `youtube.com/channel/UC...` URL, or the
+    `@handle` (with its "@") from a `youtube.com/@handle` URL, else None.
+    """
+    parsed_url = urlparse(url)
+    if "youtube.com" not in parsed_url.netloc:
+        return None
+    parts = [part for part in parsed_url.path.split("/") if part]
+    if len(parts) >= 2 and parts[0] == "channel":
+        return parts[1]
+    if parts and parts[0].startswith("@") and len(parts[0]) > 1:
+        return parts[0]
+    return None
+
+
+def get_playlist_video_ids(playlist_id, max_results=25):
+    """
+    Returns (video_ids, error_message) for the first `max_results`
+    videos of a playlist, via the YouTube Data API v3.
+    """
+    api_key = os.getenv("YOUTUBE_API_KEY", "")
+    if not api_key:
+        return None, "YOUTUBE_API_KEY is not set."
+
+    try:
+        youtube = _youtube_client(api_key)
+        video_ids = []
+        page_token = None
+        while len(video_ids) < max_results:
+            response = youtube.playlistItems().list(
+                part="contentDetails",
+                playlistId=playlist_id,
+                maxResults=min(50, max_results - len(video_ids)),
+                pageToken=page_token
+            ).execute()
+            video_ids.extend(
+                item["contentDetails"]["videoId"] for item in response.get("items", [])
+            )
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+    except Exception as e:
+        return None, f"YouTube Data API playlist fetch failed: {e}"
+
+    if not video_ids:
+        return None, f"Playlist '{playlist_id}' has no accessible videos."
+    return video_ids, None
+
+
+def get_channel_upload_ids(channel_id, max_results=10):
+    """
+    Returns (video_ids, error_message) for a channel's most recent uploads.
+    `channel_id` is a channel ID or an "@handle".
+    """
+    api_key = os.getenv("YOUTUBE_API_KEY", "")
+    if not api_key:
+        return None, "YOUTUBE_API_KEY is not set."
+
+    try:
+        lookup = {"forHandle": channel_id} if channel_id.startswith("@") else {"id": channel_id}
+        response = _youtube_client(api_key).channels().list(
+            part="contentDetails",
+            **lookup
+        ).execute()
+    except Exception as e:
+        return None, f"YouTube Data API channel fetch failed: {e}"
+
+    items = response.get("items", [])
+    if not items:
+        return None, f"YouTube API returned no data for channel '{channel_id}'."
+
+    uploads = items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+    return get_playlist_video_ids(uploads, max_results=max_results)
+
+
+def timestamp_url(video_id, seconds):
+    """
+    Deep link that starts playback at `seconds`.
+    """
+    return f"https://www.youtube.com/watch?v={video_id}&t={int(seconds)}s"
+
+
+def segments_to_text(segments):
+    return " ".join(seg.text for seg in segments)
+
+
 def get_transcript(video_id):
     """
     Fetches the captions/transcript for a YouTube video using the
-    official YouTube Data API v3 (captions resource).
+    official YouTube Data API v3 (captions resource), with
+    youtube-transcript-api and video metadata as fallbacks.
 
     Returns (transcript_text, error_message).
     transcript_text is None only if the fetch fails.
@@ -27,6 +138,19 @@ def get_transcript(video_id):
     Required env var:
         YOUTUBE_API_KEY  — your Google Cloud YouTube Data API v3 key
     """
+    segments, err = get_transcript_segments(video_id)
+    if segments is None:
+        return None, err
+    return segments_to_text(segments), err
+
+
+def get_transcript_segments(video_id):
+    """
+    Same as get_transcript(), but keeps caption timing.
+
+    Returns (segments, error_message), where segments is a list of
+    Segment(start, end, text) in playback order.
+    """
     api_key = os.getenv("YOUTUBE_API_KEY", "")
     if not api_key:
         return None, (
@@ -34,135 +158,353 @@ def get_transcript(video_id):
             "Add it to your .env file or environment variables."
         )
 
-    try:
-        from googleapiclient.discovery import build
-        from googleapiclient.errors import HttpError
-
-        youtube = build("youtube", "v3", developerKey=api_key)
-
-        # ── 1. Try the official captions list + download ──────────────────────
-        try:
-            captions_response = youtube.captions().list(
-                part="snippet",
-                videoId=video_id
-            ).execute()
-
-            caption_items = captions_response.get("items", [])
+    with metrics.trace("transcript.fetch", video_id=video_id) as span:
+        segments, err = _default_service(api_key).fetch(video_id)
+        span["segments"] = len(segments or [])
+    return segments, err
 
-            # Prefer English captions; fall back to the first available track
-            caption_id = None
-            for item in caption_items:
-                lang = item["snippet"].get("language", "")
-                if lang.startswith("en"):
-                    caption_id = item["id"]
-                    break
 
-            if caption_id is None and caption_items:
-                caption_id = caption_items[0]["id"]
+class TranscriptService:
+    """
+    Runs transcript tiers concurrently and returns the best-priority
+    success, caching results on disk by video ID.
+
+    `tiers` is an ordered list of (name, provider) pairs; each provider is
+    called as provider(video_id) and returns (segments, note) — segments
+    is None or empty when the tier has nothing. All tiers start at once, so a video without
+    accessible captions pays for the slowest tier rather than the sum of
+    every failed round-trip. A lower-priority result is only used once
+    every higher-priority tier has failed.
+
+    Results that come with a note (a degraded tier, e.g. the description
+    fallback) are cached for `fallback_ttl` seconds instead of `ttl`, so
+    one transient failure of the transcript tiers is retried soon. If
+    `fallback_ttl` is 0, those results are not cached.
+    """
 
-            if caption_id:
-                raw_bytes = youtube.captions().download(
-                    id=caption_id,
-                    tfmt="srt"          # SubRip format — plain text segments
-                ).execute()
+    def __init__(self, tiers, cache_dir=None, ttl=86400.0, fallback_ttl=300.0, max_workers=4):
+        self.tiers = list(tiers)
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="transcript"
+        )
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def fetch(self, video_id):
+        """
+        Returns (segments, error_message), like get_transcript_segments().
+        """
+        cached = self._cache_get(video_id)
+        if cached is not None:
+            metrics.inc("transcript.cache_hit")
+            return cached
+        metrics.inc("transcript.cache_miss")
+
+        futures = [
+            (name, self._executor.submit(self._run_tier, name, provider, video_id))
+            for name, provider in self.tiers
+        ]
+
+        first_error = None
+        last_note = None
+        for name, future in futures:          # priority order
+            try:
+                segments, note = future.result()
+            except Exception as e:
+                first_error = first_error or e
+                continue
+
+            if segments and any(seg.text.strip() for seg in segments):
+                for _, other in futures:
+                    other.cancel()              # not-yet-started tiers only
+                self._cache_put(video_id, segments, note)
+                return segments, note
+            last_note = note or last_note
+
+        if last_note:
+            return None, last_note
+        if first_error is not None:
+            return None, f"YouTube Data API fetch failed: {first_error}"
+        return None, (
+            "No transcript or description is available for this video. "
+            "It may be private, restricted, or have no captions enabled."
+        )
 
-                transcript_text = _parse_srt(raw_bytes.decode("utf-8", errors="replace"))
+    @staticmethod
+    def _run_tier(name, provider, video_id):
+        with metrics.trace(f"transcript.tier.{name}") as span:
+            segments, note = provider(video_id)
+            span["ok"] = int(bool(segments))
+        return segments, note
 
-                if transcript_text and transcript_text.strip():
-                    return transcript_text, None
+    # ── Disk cache ──────────────────────────────────────────────────────────
 
-        except HttpError as caption_err:
-            # 403 / 401 means OAuth is required for caption download — fall through
-            # to the transcript3 fallback below
-            if caption_err.resp.status not in (401, 403):
-                raise
+    def _cache_path(self, video_id):
+        safe_id = "".join(c for c in video_id if c.isalnum() or c in "-_")
+        return os.path.join(self.cache_dir, f"{safe_id}.json")
 
-        # ── 2. Fallback: youtube-transcript-api (pip package) ─────────────────
-        #    This works for videos that have auto-generated or manual captions
-        #    with public visibility, without needing OAuth.
+    def _cache_get(self, video_id):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(video_id), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        default_ttl = self.fallback_ttl if entry.get("note") else self.ttl
+        ttl = min(self.ttl, entry.get("ttl", default_ttl))
+        if time.time() - entry.get("fetched_at", 0) > ttl or "segments" not in entry:
+            return None
+        return [Segment(*seg) for seg in entry["segments"]], entry.get("note")
+
+    def _cache_put(self, video_id, segments, note):
+        ttl = self.fallback_ttl if note else self.ttl
+        if not self.cache_dir or ttl <= 0:
+            return
+        path = self._cache_path(video_id)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
         try:
-            from youtube_transcript_api import YouTubeTranscriptApi
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"segments": segments, "note": note, "fetched_at": time.time(), "ttl": ttl}, f
+                )
+            os.replace(tmp, path)
+        except OSError:
+            pass   # caching is best-effort
 
-            transcript_list = YouTubeTranscriptApi.get_transcript(
-                video_id, languages=["en", "en-US", "en-GB"]
-            )
-            transcript_text = " ".join(
-                html.unescape(seg["text"]) for seg in transcript_list
-            )
 
-            if transcript_text and transcript_text.strip():
-                return transcript_text, None
+def youtube_tiers(api_key):
+    """
+    The four transcript tiers, in priority order:
+        1. captions API download (official SRT)
+        2. youtube-transcript-api, English
+        3. youtube-transcript-api, any language
+        4. video title + description
+    """
+    return [
+        ("captions_api", lambda video_id: _fetch_captions_api(api_key, video_id)),
+        ("transcript_api_en", _fetch_transcript_api_english),
+        ("transcript_api_any", _fetch_transcript_api_any),
+        ("metadata", lambda video_id: _fetch_metadata(api_key, video_id)),
+    ]
 
-        except Exception:
-            pass   # Will try any language next
 
-        # ── 3. Last resort: any available language via transcript API ──────────
-        try:
-            from youtube_transcript_api import YouTubeTranscriptApi, TranscriptList
+_services = {}
+_services_lock = threading.Lock()
 
-            transcript_list_obj = YouTubeTranscriptApi.list_transcripts(video_id)
-            transcript = transcript_list_obj.find_transcript(
-                [t.language_code for t in transcript_list_obj]
+
+def _default_service(api_key):
+    """
+    One TranscriptService per API key, configured from env vars.
+
+    Optional env vars:
+        RECALL_TRANSCRIPT_CACHE_DIR  — disk cache directory (default .cache/transcripts)
+        RECALL_TRANSCRIPT_CACHE_TTL  — seconds a cached transcript is reused
+                                       (default 86400, 0 disables the cache)
+        RECALL_TRANSCRIPT_FALLBACK_TTL — seconds a degraded result (description
+                                       fallback) is reused (default 300, 0 never
+                                       caches it)
+    """
+    with _services_lock:
+        service = _services.get(api_key)
+        if service is None:
+            ttl = float(os.getenv("RECALL_TRANSCRIPT_CACHE_TTL", 86400))
+            cache_dir = os.getenv(
+                "RECALL_TRANSCRIPT_CACHE_DIR", os.path.join(".cache", "transcripts")
             )
-            segments = transcript.fetch()
-            transcript_text = " ".join(
-                html.unescape(seg["text"]) for seg in segments
+            service = _services[api_key] = TranscriptService(
+                youtube_tiers(api_key),
+                cache_dir=cache_dir if ttl > 0 else None,
+                ttl=ttl,
+                fallback_ttl=float(os.getenv("RECALL_TRANSCRIPT_FALLBACK_TTL", 300)),
             )
+        return service
+
 
-            if transcript_text and transcript_text.strip():
-                return transcript_text, None
+# ── Transcript tiers ────────────────────────────────────────────────────────
 
-        except Exception:
-            pass
+def _fetch_captions_api(api_key, video_id):
+    """
+    Tier 1: the official captions list + download.
+    """
+    from googleapiclient.errors import HttpError
 
-        # ── 4. Pull video metadata as fallback context ─────────────────────────
-        #    If no caption track is accessible, return the video description,
-        #    which at least gives the RAG pipeline something to work with.
-        video_response = youtube.videos().list(
+    youtube = _youtube_client(api_key)
+    try:
+        captions_response = youtube.captions().list(
             part="snippet",
-            id=video_id
+            videoId=video_id
         ).execute()
 
-        items = video_response.get("items", [])
-        if not items:
-            return None, f"YouTube API returned no data for video ID '{video_id}'."
+        caption_items = captions_response.get("items", [])
 
-        snippet = items[0]["snippet"]
-        description = snippet.get("description", "").strip()
-        title = snippet.get("title", "")
+        # Prefer English captions; fall back to the first available track
+        caption_id = None
+        for item in caption_items:
+            lang = item["snippet"].get("language", "")
+            if lang.startswith("en"):
+                caption_id = item["id"]
+                break
 
-        if not description:
-            return None, (
-                "No transcript or description is available for this video. "
-                "It may be private, restricted, or have no captions enabled."
-            )
+        if caption_id is None and caption_items:
+            caption_id = caption_items[0]["id"]
+
+        if caption_id:
+            raw_bytes = youtube.captions().download(
+                id=caption_id,
+                tfmt="srt"          # SubRip format — plain text segments
+            ).execute()
+
+            return _parse_srt_segments(raw_bytes.decode("utf-8", errors="replace")), None
+
+    except HttpError as caption_err:
+        # 403 / 401 means OAuth is required for caption download — the
+        # transcript-api tiers cover this case
+        if caption_err.resp.status not in (401, 403):
+            raise
+
+    return None, None
+
+
+def _fetch_transcript_api_english(video_id):
+    """
+    Tier 2: youtube-transcript-api (pip package), English tracks.
+    This works for videos that have auto-generated or manual captions
+    with public visibility, without needing OAuth.
+    """
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    transcript_list = YouTubeTranscriptApi.get_transcript(
+        video_id, languages=["en", "en-US", "en-GB"]
+    )
+    return _api_segments(transcript_list), None
+
+
+def _fetch_transcript_api_any(video_id):
+    """
+    Tier 3: any available language via youtube-transcript-api.
+    """
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    transcript_list_obj = YouTubeTranscriptApi.list_transcripts(video_id)
+    transcript = transcript_list_obj.find_transcript(
+        [t.language_code for t in transcript_list_obj]
+    )
+    return _api_segments(transcript.fetch()), None
+
+
+def _fetch_metadata(api_key, video_id):
+    """
+    Tier 4: video title + description as fallback context.
+    If no caption track is accessible, the description at least gives
+    the RAG pipeline something to work with.
+    """
+    youtube = _youtube_client(api_key)
+    video_response = youtube.videos().list(
+        part="snippet",
+        id=video_id
+    ).execute()
 
-        metadata_text = f"Title: {title}\n\nDescription:\n{description}"
-        return metadata_text, (
-            "Note: A full transcript could not be retrieved. "
-            "Answers are based on the video's title and description only."
+    items = video_response.get("items", [])
+    if not items:
+        return None, f"YouTube API returned no data for video ID '{video_id}'."
+
+    snippet = items[0]["snippet"]
+    description = snippet.get("description", "").strip()
+    title = snippet.get("title", "")
+
+    if not description:
+        return None, (
+            "No transcript or description is available for this video. "
+            "It may be private, restricted, or have no captions enabled."
         )
 
-    except Exception as e:
-        return None, f"YouTube Data API fetch failed: {e}"
+    metadata_text = f"Title: {title}\n\nDescription:\n{description}"
+    return [Segment(None, None, metadata_text)], (
+        "Note: A full transcript could not be retrieved. "
+        "Answers are based on the video's title and description only."
+    )
 
 
 # ── Internal helpers ────────────────────────────────────────────────────────
 
-def _parse_srt(srt_text):
+_thread_clients = threading.local()
+
+
+def _youtube_client(api_key):
     """
-    Strips SRT timing/index lines and returns a clean block of caption text.
+    Cached discovery client. googleapiclient clients are not thread-safe
+    (they share one httplib2 connection), so each worker thread keeps its
+    own — the tier pool reuses threads, so each is built only once.
     """
-    import re
-    lines = srt_text.splitlines()
+    clients = getattr(_thread_clients, "clients", None)
+    if clients is None:
+        clients = _thread_clients.clients = {}
+    client = clients.get(api_key)
+    if client is None:
+        from googleapiclient.discovery import build
+        client = clients[api_key] = build("youtube", "v3", developerKey=api_key)
+    return client
+
+
+def _api_segments(raw_segments):
+    """
+    youtube-transcript-api entries ({text, start, duration}) → Segments.
+    """
+    segments = []
+    for seg in raw_segments:
+        start = float(seg["start"])
+        segments.append(
+            Segment(start, start + float(seg.get("duration", 0.0)), html.unescape(seg["text"]))
+        )
+    return segments
+
+
+_SRT_TIMING = re.compile(
+    r"(\d{1,2}):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*"
+    r"(\d{1,2}):(\d{2}):(\d{2})[,.](\d{3})"
+)
+
+
+def _parse_srt_segments(srt_text):
+    """
+    Parses SRT cues into Segments, dropping index lines and joining
+    multi-line cue text with spaces.
+    """
+    def seconds(h, m, s, ms):
+        return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000.0
+
+    segments = []
+    start = end = None
     text_lines = []
-    for line in lines:
+
+    def flush():
+        if text_lines:
+            segments.append(Segment(start, end, " ".join(text_lines)))
+        text_lines.clear()
+
+    for line in srt_text.splitlines():
         line = line.strip()
         if not line:
             continue
-        if line.isdigit():               # sequence number
+        timing = _SRT_TIMING.match(line)
+        if timing:                        # timestamp line starts a new cue
+            flush()
+            groups = timing.groups()
+            start, end = seconds(*groups[:4]), seconds(*groups[4:])
             continue
-        if re.match(r"\d{2}:\d{2}:\d{2}", line):   # timestamp line
+        if line.isdigit():               # sequence number
             continue
         text_lines.append(html.unescape(line))
-    return " ".join(text_lines)
+    flush()
+    return segments
+
+
+def _parse_srt(srt_text):
+    """
+    Strips SRT timing/index lines and returns a clean block of caption text.
+    """
+    return segments_to_text(_parse_srt_segments(srt_text))